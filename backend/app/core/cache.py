@@ -1,13 +1,269 @@
+import asyncio
 import json
-from typing import Optional, Any
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from glob import escape as glob_escape
+from typing import Callable, Optional, Any
 import redis.asyncio as redis
 from app.config import get_settings
+from app.core.codecs import decode, encode, get_codec
 
 settings = get_settings()
 
+
+class LocalLRU:
+    """In-process LRU with per-entry TTL, bounded by entry count and (optionally) bytes."""
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[float, Any, int]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self.delete(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, size: int = 0) -> None:
+        """Store `value`; `size` (e.g. its encoded length) counts against max_bytes."""
+        self.delete(key)
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes
+        ):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def delete_matching(self, pattern: str) -> None:
+        """Drop keys matching a glob pattern (Redis KEYS syntax)."""
+        for key in [key for key in self._entries if fnmatchcase(key, pattern)]:
+            self.delete(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    How a key namespace (key prefix) is cached.
+
+    local_ttl: seconds an entry may be served from the in-process tier
+    (capped by the Redis expiry); None keeps the namespace Redis-only.
+    Other workers' invalidations arrive over the invalidation bus; while it
+    is not subscribed, local entries are capped at local_cache_fallback_ttl.
+
+    generational: keys embed the namespace's generation counter, and
+    delete_pattern("<prefix>*") is a single INCR instead of a key scan.
+    Entries of old generations are never read again and expire on their own.
+
+    codec: "json" (orjson when installed) or "msgpack", see app.core.codecs.
+    Keys get a "|<codec>" suffix, so workers of different versions never
+    read each other's formats during a rollout. None stores plain JSON text
+    under the bare key (version counters, job records).
+    compress_above: zlib-compress encoded values larger than this many bytes.
+    """
+    local_ttl: Optional[float] = None
+    generational: bool = False
+    codec: Optional[str] = None
+    compress_above: Optional[int] = None
+
+
+# Namespaces served from the in-process tier; everything else is Redis-only
+# (import job records and version counters must always be read fresh).
+CACHE_POLICIES: dict[str, CachePolicy] = {
+    # Not generational: stale stats are served while they are recomputed
+    # (see app.services.dashboard_stats)
+    "dashboard_stats_": CachePolicy(local_ttl=60, codec="json"),
+    "product_count_": CachePolicy(local_ttl=60, generational=True, codec="json"),
+    "forecast_snapshot_": CachePolicy(
+        generational=True, codec="msgpack", compress_above=settings.cache_compress_threshold
+    ),
+    # Keyed by catalog / category version, so local copies never go stale
+    "smart_search_": CachePolicy(
+        local_ttl=settings.smart_search_cache_ttl,
+        codec="json",
+        compress_above=settings.cache_compress_threshold,
+    ),
+    "parsed_query_": CachePolicy(local_ttl=settings.parsed_query_cache_ttl, codec="json"),
+}
+
+# Redis counters holding each generational namespace's current generation
+GENERATION_KEY_PREFIX = "cache_generation:"
+
+# Keys per SCAN/DELETE round trip (pattern deletes and the sweeper)
+SCAN_BATCH = 500
+
+# Delete a lock only if it still holds our token
+_UNLOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Pub/sub channel carrying invalidations between workers
+INVALIDATION_CHANNEL = "cache_invalidation"
+
+DEFAULT_POLICY = CachePolicy()
+
+
 class CacheService:
-    def __init__(self):
+    """
+    Redis cache with an optional in-process L1 tier.
+
+    Namespaces with a local policy are answered from a bounded LRU (entry
+    count and byte budget) without a network round trip or JSON decode, and
+    keep being served from it while Redis is unavailable. Values returned
+    from the local tier are shared objects: callers must not mutate them.
+    """
+
+    def __init__(self, policies: Optional[dict[str, CachePolicy]] = None):
         self.redis: Optional[redis.Redis] = None
+        self.policies = CACHE_POLICIES if policies is None else policies
+        self.local = LocalLRU(
+            max_entries=settings.local_cache_max_entries,
+            ttl=0,
+            max_bytes=settings.local_cache_max_bytes,
+        )
+        self._stats: dict[str, dict[str, int]] = {}
+        self._origin = uuid.uuid4().hex  # Skips our own published messages
+        self._invalidators: list[Callable[[str], None]] = []
+        self._listener: Optional[asyncio.Task] = None
+        self.bus_live = False  # Subscribed to INVALIDATION_CHANNEL
+        # Generational namespace prefix -> (generation, recheck_at); kept
+        # current by the bus, re-read from Redis while it is down
+        self._generations: dict[str, tuple[int, float]] = {}
+
+    def add_local_invalidator(self, callback: Callable[[str], None]) -> None:
+        """Call `callback(pattern)` on every invalidation, local or remote."""
+        self._invalidators.append(callback)
+
+    def _evict_local(self, pattern: str) -> None:
+        self.local.delete_matching(pattern)
+        for callback in self._invalidators:
+            callback(pattern)
+
+    def _local_ttl(self, policy: CachePolicy, expire: float) -> float:
+        ttl = min(policy.local_ttl, expire)
+        if not self.bus_live:
+            ttl = min(ttl, settings.local_cache_fallback_ttl)
+        return ttl
+
+    async def _generation(self, prefix: str) -> int:
+        """Current generation of a namespace (0 until first invalidated)."""
+        known = self._generations.get(prefix)
+        now = time.monotonic()
+        if known and (self.bus_live or known[1] > now):
+            return known[0]
+        generation = known[0] if known else 0
+        if self.redis:
+            try:
+                value = await self.redis.get(f"{GENERATION_KEY_PREFIX}{prefix}")
+                generation = int(value) if value else 0
+            except Exception as e:
+                print(f"Cache GET error: {e}")
+        self._generations[prefix] = (generation, now + settings.local_cache_fallback_ttl)
+        return generation
+
+    async def generation(self, prefix: str) -> int:
+        """
+        Current generation of a generational namespace.
+
+        Read it before computing a value from the database and pass it to
+        set(), so a result that an invalidation overtook is not stored.
+        """
+        return await self._generation(prefix)
+
+    async def _bump_generation(self, prefix: str) -> int:
+        generation = None
+        if self.redis:
+            try:
+                generation = await self.redis.incr(f"{GENERATION_KEY_PREFIX}{prefix}")
+            except Exception as e:
+                print(f"Cache INCR error: {e}")
+        if generation is None:
+            known = self._generations.get(prefix)
+            generation = (known[0] if known else 0) + 1
+        self._generations[prefix] = (generation, time.monotonic() + settings.local_cache_fallback_ttl)
+        return generation
+
+    async def _resolve(self, key: str) -> tuple[str, str, CachePolicy]:
+        """(stored key, namespace, policy) for a caller's key."""
+        namespace, policy = self._namespace(key)
+        if policy.generational:
+            generation = await self._generation(namespace)
+            key = f"{namespace}{generation}:{key[len(namespace):]}"
+        if policy.codec:
+            key = f"{key}|{get_codec(policy.codec).name}"
+        return key, namespace, policy
+
+    @staticmethod
+    def _dumps(policy: CachePolicy, value: Any) -> bytes | str:
+        if policy.codec:
+            return encode(get_codec(policy.codec), value, policy.compress_above)
+        return json.dumps(value)
+
+    @staticmethod
+    def _loads(policy: CachePolicy, data: bytes) -> Any:
+        if policy.codec:
+            return decode(get_codec(policy.codec), data)
+        return json.loads(data)
+
+    def _namespace(self, key: str) -> tuple[str, CachePolicy]:
+        """Longest configured prefix of `key`, or "default"."""
+        best = ""
+        for prefix in self.policies:
+            if key.startswith(prefix) and len(prefix) > len(best):
+                best = prefix
+        return (best, self.policies[best]) if best else ("default", DEFAULT_POLICY)
+
+    def _count(self, namespace: str, outcome: str) -> None:
+        counters = self._stats.setdefault(namespace, {"local_hits": 0, "redis_hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def stats(self) -> dict:
+        """Hit counts and ratios per namespace and tier."""
+        namespaces = {}
+        for namespace, counters in self._stats.items():
+            lookups = sum(counters.values())
+            namespaces[namespace] = {
+                **counters,
+                "local_hit_ratio": counters["local_hits"] / lookups if lookups else 0.0,
+                "redis_hit_ratio": counters["redis_hits"] / lookups if lookups else 0.0,
+            }
+        return {
+            "local_entries": len(self.local),
+            "local_bytes": self.local.size_bytes,
+            "namespaces": namespaces,
+        }
 
     async def connect(self):
         """Initialize Redis connection."""
@@ -15,7 +271,7 @@ class CacheService:
             self.redis = redis.from_url(
                 settings.redis_url,
                 encoding="utf-8",
-                decode_responses=True,
+                decode_responses=False,  # Values may be binary (see CachePolicy.codec)
                 socket_timeout=2.0,  # 2 second timeout
                 socket_connect_timeout=2.0,
             )
@@ -31,36 +287,255 @@ class CacheService:
             await self.redis.close()
 
     async def get(self, key: str) -> Optional[Any]:
-        """Get value from cache."""
+        """Get value from cache (local tier first, when the namespace allows)."""
+        key, namespace, policy = await self._resolve(key)
+        if policy.local_ttl is not None:
+            value = self.local.get(key)
+            if value is not None:
+                self._count(namespace, "local_hits")
+                return value
+        if self.redis:
+            try:
+                if policy.local_ttl is None:
+                    value = await self.redis.get(key)
+                else:
+                    # The local copy must not outlive the Redis entry
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        value, remaining_ms = await pipe.get(key).pttl(key).execute()
+                if value:
+                    self._count(namespace, "redis_hits")
+                    decoded = self._loads(policy, value)
+                    if policy.local_ttl is not None:
+                        expire = remaining_ms / 1000 if remaining_ms > 0 else policy.local_ttl
+                        ttl = self._local_ttl(policy, expire)
+                        self.local.set(key, decoded, ttl=ttl, size=len(value))
+                    return decoded
+            except Exception as e:
+                print(f"Cache GET error: {e}")
+        self._count(namespace, "misses")
+        return None
+
+    async def set(self, key: str, value: Any, expire: int = 60, generation: Optional[int] = None):
+        """
+        Set value in cache with TTL.
+
+        With `generation` (see generation()), the value is dropped if the
+        namespace has been invalidated since.
+        """
+        if generation is not None and await self._generation(self._namespace(key)[0]) != generation:
+            return
+        key, _, policy = await self._resolve(key)
+        encoded = self._dumps(policy, value)
+        if policy.local_ttl is not None:
+            self.local.set(key, value, ttl=self._local_ttl(policy, expire), size=len(encoded))
+        if not self.redis:
+            return
+        try:
+            await self.redis.set(key, encoded, ex=expire)
+        except Exception as e:
+            print(f"Cache SET error: {e}")
+            return
+        if policy.local_ttl is not None:
+            # Other workers drop their local copy and read the new value
+            await self._publish(key=key)
+
+    async def incr(self, key: str) -> Optional[int]:
+        """Atomically increment a counter; None when Redis is unavailable."""
         if not self.redis:
             return None
         try:
-            value = await self.redis.get(key)
-            if value:
-                return json.loads(value)
+            return await self.redis.incr(key)
+        except Exception as e:
+            print(f"Cache INCR error: {e}")
+        return None
+
+    async def push(self, key: str, value: Any) -> bool:
+        """Append a value to a list used as a queue; False when Redis is unavailable."""
+        if not self.redis:
+            return False
+        try:
+            await self.redis.lpush(key, json.dumps(value))
+            return True
+        except Exception as e:
+            print(f"Cache PUSH error: {e}")
+        return False
+
+    async def pop(self, key: str, timeout: int = 1) -> Optional[Any]:
+        """Block up to `timeout` seconds (below the socket timeout) for the oldest queued value."""
+        if not self.redis:
+            return None
+        try:
+            item = await self.redis.brpop(key, timeout=timeout)
+            if item:
+                return json.loads(item[1])
+        except Exception as e:
+            print(f"Cache POP error: {e}")
+        return None
+
+    async def lock(self, name: str, ttl: int) -> Optional[str]:
+        """
+        Take a cross-worker lock for up to `ttl` seconds.
+
+        Returns a token for unlock(), or None if another worker holds it.
+        Without Redis there is only this process, so the lock is granted.
+        """
+        token = uuid.uuid4().hex
+        if not self.redis:
+            return token
+        try:
+            if await self.redis.set(f"lock:{name}", token, nx=True, ex=ttl):
+                return token
+            return None
         except Exception as e:
-            print(f"Cache GET error: {e}")
+            print(f"Cache LOCK error: {e}")
         return None
 
-    async def set(self, key: str, value: Any, expire: int = 60):
-        """Set value in cache with TTL."""
+    async def unlock(self, name: str, token: str) -> None:
+        """Release a lock taken by lock(), unless it expired and changed hands."""
         if not self.redis:
             return
         try:
-            await self.redis.set(key, json.dumps(value), ex=expire)
+            await self.redis.eval(_UNLOCK_SCRIPT, 1, f"lock:{name}", token)
         except Exception as e:
-            print(f"Cache SET error: {e}")
+            print(f"Cache UNLOCK error: {e}")
+
+    async def delete(self, key: str):
+        """Delete one key in every worker."""
+        key, _, _ = await self._resolve(key)
+        self._evict_local(glob_escape(key))
+        if not self.redis:
+            return
+        try:
+            await self.redis.delete(key)
+        except Exception as e:
+            print(f"Cache DELETE error: {e}")
+        await self._publish(key=key)
 
     async def delete_pattern(self, pattern: str):
-        """Delete keys matching pattern."""
+        """
+        Delete keys matching pattern, in every worker.
+
+        "<prefix>*" for a generational namespace only bumps its generation;
+        other patterns are deleted with SCAN, which never blocks Redis.
+        """
+        self._evict_local(pattern)
+        prefix = pattern[:-1] if pattern.endswith("*") else None
+        if prefix in self.policies and self.policies[prefix].generational:
+            generation = await self._bump_generation(prefix)
+            if self.redis:
+                await self._publish(pattern=pattern, namespace=prefix, generation=generation)
+            return
         if not self.redis:
             return
         try:
-            keys = await self.redis.keys(pattern)
-            if keys:
-                await self.redis.delete(*keys)
+            await self._scan_delete(pattern)
         except Exception as e:
             print(f"Cache DELETE error: {e}")
+        await self._publish(pattern=pattern)
+
+    async def _scan_delete(self, pattern: str, keep=None) -> int:
+        """Delete keys matching pattern (except where keep(key)) in SCAN batches."""
+        deleted = 0
+        batch: list[str] = []
+        async for key in self.redis.scan_iter(match=pattern, count=SCAN_BATCH):
+            if keep is None or not keep(key.decode() if isinstance(key, bytes) else key):
+                batch.append(key)
+            if len(batch) >= SCAN_BATCH:
+                deleted += await self.redis.delete(*batch)
+                batch.clear()
+        if batch:
+            deleted += await self.redis.delete(*batch)
+        return deleted
+
+    async def sweep_stale_generations(self) -> int:
+        """Delete entries of past generations early (they also expire by TTL)."""
+        if not self.redis:
+            return 0
+        deleted = 0
+        for prefix, policy in self.policies.items():
+            if not policy.generational:
+                continue
+            current = f"{prefix}{await self._generation(prefix)}:"
+            try:
+                deleted += await self._scan_delete(
+                    f"{glob_escape(prefix)}*", keep=lambda key: key.startswith(current)
+                )
+            except Exception as e:
+                print(f"Cache SWEEP error: {e}")
+        return deleted
+
+    async def run_sweep_loop(self, interval: float) -> None:
+        """Sweep stale generations every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            deleted = await self.sweep_stale_generations()
+            if deleted:
+                print(f"🧹 Swept {deleted} stale cache entries")
+
+    async def _publish(self, **invalidation: Any) -> None:
+        try:
+            await self.redis.publish(
+                INVALIDATION_CHANNEL, json.dumps({"origin": self._origin, **invalidation})
+            )
+        except Exception as e:
+            print(f"Cache PUBLISH error: {e}")
+
+    def _on_invalidation(self, data: str) -> None:
+        """Apply an invalidation published by another worker."""
+        message = json.loads(data)
+        if message.get("origin") == self._origin:
+            return
+        if "generation" in message:
+            prefix = message["namespace"]
+            known = self._generations.get(prefix)
+            if not known or known[0] < message["generation"]:
+                self._generations[prefix] = (
+                    message["generation"], time.monotonic() + settings.local_cache_fallback_ttl
+                )
+        if "key" in message:
+            self._evict_local(glob_escape(message["key"]))
+        elif "pattern" in message:
+            self._evict_local(message["pattern"])
+
+    async def _listen(self) -> None:
+        """Apply other workers' invalidations until cancelled; resubscribe on errors."""
+        while True:
+            if not self.redis:
+                await asyncio.sleep(5)
+                continue
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Invalidations may have been missed while unsubscribed
+                self._generations.clear()
+                self._evict_local("*")
+                self.bus_live = True
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message:
+                        self._on_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Cache invalidation bus lost: {e}")
+            finally:
+                self.bus_live = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(1)
+
+    def start_listener(self) -> None:
+        """Subscribe to other workers' invalidations (called from lifespan)."""
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    def stop_listener(self) -> None:
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+
 
 # Global Cache Instance
 cache = CacheService()
@@ -0,0 +1,94 @@
+"""Serialization codecs for cached values.
+
+A codec turns a JSON-compatible value into bytes and back. "json" uses
+orjson when it is installed (same format, several times faster) and the
+standard library otherwise; "msgpack" is a compact binary format and needs
+the optional msgpack package (`pip install inventory-api[cache]`).
+
+Encoded payloads start with a one-byte marker so values above a namespace's
+size threshold can be zlib-compressed transparently.
+"""
+import json
+import zlib
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_PLAIN = b"p"
+_ZLIB = b"z"
+
+# Fast compression: cached values are written often and read soon
+ZLIB_LEVEL = 1
+
+
+class JsonCodec:
+    """JSON via orjson when available."""
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(value)
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """MessagePack (optional dependency)."""
+    name = "msgpack"
+
+    def __init__(self) -> None:
+        import msgpack
+
+        self._msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self._msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return self._msgpack.unpackb(data, raw=False)
+
+
+_codecs: dict[str, JsonCodec | MsgpackCodec] = {}
+
+
+def get_codec(name: str) -> JsonCodec | MsgpackCodec:
+    """Codec by name; falls back to JSON when msgpack is not installed."""
+    codec = _codecs.get(name)
+    if codec is None:
+        if name == "msgpack":
+            try:
+                codec = MsgpackCodec()
+            except ImportError:
+                print("⚠️ msgpack not installed, caching with JSON instead")
+                codec = JsonCodec()
+        elif name == "json":
+            codec = JsonCodec()
+        else:
+            raise ValueError(f"Unknown cache codec: {name}")
+        _codecs[name] = codec
+    return codec
+
+
+def encode(codec: JsonCodec | MsgpackCodec, value: Any, compress_above: int | None) -> bytes:
+    """Serialize `value`, compressing it when larger than `compress_above` bytes."""
+    data = codec.dumps(value)
+    if compress_above is not None and len(data) > compress_above:
+        return _ZLIB + zlib.compress(data, ZLIB_LEVEL)
+    return _PLAIN + data
+
+
+def decode(codec: JsonCodec | MsgpackCodec, payload: bytes) -> Any:
+    """Inverse of encode()."""
+    marker, data = payload[:1], payload[1:]
+    if marker == _ZLIB:
+        data = zlib.decompress(data)
+    elif marker != _PLAIN:
+        raise ValueError("Unknown cache payload marker")
+    return codec.loads(data)
@@ -1,4 +1,6 @@
 """Rate limiting configuration using SlowAPI."""
+from fastapi import Request
+from limits import parse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -9,3 +11,15 @@ limiter = Limiter(key_func=get_remote_address)
 DEFAULT_LIMIT = "100/minute"
 AI_SEARCH_LIMIT = "10/minute"  # Stricter for expensive AI operations
 AUTH_LIMIT = "20/minute"  # Protect against brute force
+
+
+def consume_ai_budget(request: Request) -> bool:
+    """
+    Take one LLM call from the client's AI_SEARCH_LIMIT budget.
+    
+    Returns False once the budget is spent; smart search then answers with
+    the rule-based parse instead of rejecting the request.
+    """
+    if not limiter.enabled:
+        return True
+    return limiter.limiter.hit(parse(AI_SEARCH_LIMIT), "smart_search_llm", get_remote_address(request))
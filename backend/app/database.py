@@ -1,7 +1,11 @@
 """Async SQLAlchemy database setup."""
-from collections.abc import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
+import asyncio
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from sqlalchemy import event, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateColumn
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase, Session
 
 from app.config import get_settings
 
@@ -14,6 +18,22 @@ engine = create_async_engine(
     future=True,
 )
 
+
+def enable_sqlite_foreign_keys(async_engine: AsyncEngine) -> None:
+    """Enforce ON DELETE rules on SQLite (relationships rely on passive deletes)."""
+    if async_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_pragma(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+enable_sqlite_foreign_keys(engine)
+
+
 # Session factory
 async_session_maker = async_sessionmaker(
     engine,
@@ -22,6 +42,37 @@ async_session_maker = async_sessionmaker(
 )
 
 
+# Strong references to running after-commit tasks (asyncio keeps only weak ones)
+_after_commit_tasks: set[asyncio.Task] = set()
+
+
+def run_after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Run an async callback once the session's current transaction commits."""
+    callbacks = session.sync_session.info.setdefault("after_commit", [])
+    if callback not in callbacks:
+        callbacks.append(callback)
+
+
+@event.listens_for(Session, "after_commit")
+def _schedule_after_commit(session: Session) -> None:
+    for callback in session.info.pop("after_commit", []):
+        task = asyncio.get_running_loop().create_task(callback())
+        _after_commit_tasks.add(task)
+        task.add_done_callback(_after_commit_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_commit(session: Session) -> None:
+    session.info.pop("after_commit", None)
+
+
+def upsert_insert(session: AsyncSession, table):
+    """Dialect-specific INSERT for `table` (both support ON CONFLICT upserts)."""
+    if session.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
 class Base(DeclarativeBase):
     """Base class for all ORM models."""
     pass
@@ -40,7 +91,32 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+def _create_missing_indexes(sync_conn) -> None:
+    """Create indexes added after a table already existed (create_all skips them)."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def _add_missing_columns(sync_conn) -> None:
+    """Add nullable columns added after a table already existed (create_all skips them)."""
+    inspector = inspect(sync_conn)
+    preparer = sync_conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                ddl = CreateColumn(column).compile(dialect=sync_conn.dialect)
+                sync_conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}"))
+
+
 async def init_db() -> None:
-    """Create all tables. Called on startup."""
+    """Create all tables, missing columns/indexes and search structures. Called on startup."""
+    # Imported here: the search service depends on the models, which import this module
+    from app.services.product_search import setup_search_backend
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+        await setup_search_backend(conn)
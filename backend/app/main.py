@@ -1,4 +1,5 @@
 """FastAPI application entry point."""
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from pathlib import Path
@@ -22,13 +23,26 @@ from app.routers import (
     search_router,
     users_router,
 )
-from app.services import seed_initial_data, seed_sales_history
+from app.services import (
+    run_compaction_loop,
+    seed_initial_data,
+    seed_sales_history,
+    sync_sales_rollup,
+)
 
 # Path to frontend build output
 FRONTEND_DIR = Path(__file__).parent.parent.parent / "frontend" / "dist"
 
 
 from app.core.cache import cache
+from app.services.autocomplete import autocomplete_index
+from app.services.category_vocabulary import category_vocabulary
+from app.services.import_jobs import import_job_runner
+from app.services.product_import import shutdown_parse_pool
+from app.config import get_settings
+
+settings = get_settings()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -38,6 +52,8 @@ async def lifespan(app: FastAPI):
     
     if not is_testing:
         await cache.connect()
+        # Evict local cache entries when other workers invalidate them
+        cache.start_listener()
 
     # Startup: Create tables and seed data
     # Ensure data directory exists for SQLite
@@ -51,11 +67,38 @@ async def lifespan(app: FastAPI):
         async with async_session_maker() as session:
             await seed_initial_data(session)
             await seed_sales_history(session)
+            # Backfill/compact the daily sales rollup
+            await sync_sales_rollup(session)
+            await session.commit()
+    
+    # Keep compacting old sales orders while the process runs
+    compaction_task = None
+    sweep_task = None
+    if not is_testing:
+        compaction_task = asyncio.create_task(run_compaction_loop())
+        # Optionally delete superseded cache generations before they expire
+        if settings.cache_sweep_interval_seconds > 0:
+            sweep_task = asyncio.create_task(
+                cache.run_sweep_loop(settings.cache_sweep_interval_seconds)
+            )
+        # Build the autocomplete index in the background (SQL serves until ready)
+        autocomplete_index.warm()
+        # Load category names for the smart-search parser
+        category_vocabulary.warm()
+        # Pick up queued CSV imports (Redis queue mode only)
+        import_job_runner.start()
     
     yield
     
     # Shutdown: cleanup if needed
+    if compaction_task:
+        compaction_task.cancel()
+    if sweep_task:
+        sweep_task.cancel()
+    import_job_runner.stop()
+    shutdown_parse_pool()
     if not is_testing:
+        cache.stop_listener()
         await cache.disconnect()
 
 
@@ -96,7 +139,7 @@ app.include_router(search_router)
 @app.get("/api/health")
 async def health_check() -> dict:
     """Health check endpoint."""
-    return {"status": "healthy", "version": "1.0.0"}
+    return {"status": "healthy", "version": "1.0.0", "cache": cache.stats()}
 
 
 # ============================================================================
@@ -3,5 +3,6 @@ from app.models.user import User
 from app.models.category import Category
 from app.models.product import Product
 from app.models.sales_order import SalesOrder
+from app.models.sales_daily import SalesDaily
 
-__all__ = ["User", "Category", "Product", "SalesOrder"]
+__all__ = ["User", "Category", "Product", "SalesOrder", "SalesDaily"]
@@ -19,11 +19,12 @@ class Category(Base):
         server_default=func.now()
     )
     
-    # Relationship to products
+    # Relationship to products (never loaded implicitly)
     products: Mapped[list["Product"]] = relationship(
         "Product",
         back_populates="category",
-        lazy="selectin"
+        lazy="raise",
+        passive_deletes=True,  # ON DELETE SET NULL in the database
     )
     
     def __repr__(self) -> str:
@@ -1,16 +1,43 @@
 """Product ORM model."""
+import hashlib
+import json
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import DateTime, ForeignKey, Integer, Numeric, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, Numeric, String, Text, event, func
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
 
+# SQLite's CURRENT_TIMESTAMP has second precision. Bind values with the same
+# format so keyset comparisons against server-generated timestamps line up.
+_SQLITE_SECONDS = sqlite.DATETIME(
+    storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+)
+
+
+def compute_content_hash(
+    name: str,
+    description: str | None,
+    category_id: int | None,
+    quantity: int,
+    unit_price: Decimal | int | str,
+    low_stock_threshold: int,
+) -> str:
+    """Digest of the fields a CSV import sets, used to skip unchanged rows."""
+    price = format(Decimal(unit_price).quantize(Decimal("0.01")), "f")
+    payload = json.dumps([name, description, category_id, quantity, price, low_stock_threshold])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
 
 class Product(Base):
     """Inventory product model."""
     
     __tablename__ = "products"
+    __table_args__ = (
+        # Serves ORDER BY updated_at DESC, id DESC and keyset (cursor) seeks
+        Index("ix_products_updated_at_id", "updated_at", "id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     sku: Mapped[str] = mapped_column(String(50), unique=True, index=True)
@@ -22,6 +49,10 @@ class Product(Base):
     unit_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), default=0)
     low_stock_threshold: Mapped[int] = mapped_column(Integer, default=10)
     
+    # compute_content_hash() of the importable fields, kept current on every
+    # ORM write; NULL means unknown (the next import rewrites the row)
+    content_hash: Mapped[str | None] = mapped_column(String(40), nullable=True)
+    
     # Foreign keys
     category_id: Mapped[int | None] = mapped_column(
         ForeignKey("categories.id", ondelete="SET NULL"),
@@ -38,22 +69,23 @@ class Product(Base):
         server_default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        DateTime(timezone=True).with_variant(_SQLITE_SECONDS, "sqlite"),
         server_default=func.now(),
         onupdate=func.now()
     )
     
-    # Relationships
+    # Relationships (never loaded implicitly; endpoints opt in with loader options)
     category: Mapped["Category | None"] = relationship(
         "Category",
         back_populates="products",
-        lazy="selectin"
+        lazy="raise"
     )
     sales_orders: Mapped[list["SalesOrder"]] = relationship(
         "SalesOrder",
         back_populates="product",
-        lazy="selectin",
-        cascade="all, delete-orphan"
+        lazy="raise",
+        cascade="all, delete-orphan",
+        passive_deletes=True,  # ON DELETE CASCADE in the database
     )
     
     @property
@@ -72,3 +104,16 @@ class Product(Base):
 
 # Import at bottom to avoid circular import
 from app.models.category import Category  # noqa: E402, F401
+
+
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _set_content_hash(mapper, connection, target: Product) -> None:
+    target.content_hash = compute_content_hash(
+        target.name,
+        target.description,
+        target.category_id,
+        target.quantity if target.quantity is not None else 0,
+        target.unit_price if target.unit_price is not None else 0,
+        target.low_stock_threshold if target.low_stock_threshold is not None else 10,
+    )
@@ -0,0 +1,19 @@
+"""Daily sales rollup model for cheap analytics reads."""
+from datetime import date
+from sqlalchemy import Date, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class SalesDaily(Base):
+    """Units sold and order count per product per (UTC) day."""
+    __tablename__ = "sales_daily"
+
+    product_id: Mapped[int] = mapped_column(
+        ForeignKey("products.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
+    units: Mapped[int] = mapped_column(Integer, default=0)
+    order_count: Mapped[int] = mapped_column(Integer, default=0)
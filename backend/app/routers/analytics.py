@@ -1,9 +1,22 @@
 """Analytics router for AI-powered forecasting."""
-from fastapi import APIRouter, Query
+from datetime import date, datetime, time, timedelta, timezone
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy import select
 
 from app.core.dependencies import CurrentUser, DbSession
-from app.services.prediction import calculate_forecasts
+from app.models.product import Product
+from app.models.sales_order import SalesOrder
+from app.services.columnar_export import (
+    FILE_EXTENSIONS,
+    MEDIA_TYPES,
+    ExportFormat,
+    pyarrow_available,
+    sales_schema,
+    stream_export,
+)
+from app.services.prediction import get_cached_forecasts
 
 
 class ForecastResponse(BaseModel):
@@ -34,7 +47,7 @@ async def get_forecasts(
     
     Returns products sorted by urgency (critical items first).
     """
-    forecasts = await calculate_forecasts(db)
+    forecasts = await get_cached_forecasts(db)
 
     # Apply urgency filter if provided
     if urgency_filter:
@@ -65,7 +78,7 @@ async def get_analytics_summary(
     db: DbSession,
 ) -> dict:
     """Get a high-level summary of inventory health."""
-    forecasts = await calculate_forecasts(db)
+    forecasts = await get_cached_forecasts(db)
 
     critical_count = sum(1 for f in forecasts if f.urgency == "critical")
     warning_count = sum(1 for f in forecasts if f.urgency == "warning")
@@ -79,3 +92,55 @@ async def get_analytics_summary(
         "healthy_items": ok_count,
         "total_suggested_reorder_units": total_reorder_value,
     }
+
+
+@router.get("/sales/export/{export_format}")
+async def export_sales(
+    export_format: ExportFormat,
+    current_user: CurrentUser,
+    start_date: date | None = Query(None, description="First day (UTC) to include"),
+    end_date: date | None = Query(None, description="Last day (UTC) to include"),
+) -> StreamingResponse:
+    """
+    Export raw sales orders as an Arrow IPC stream or Parquet file.
+    
+    Only orders still inside the retention window are available; older
+    sales exist only as daily totals.
+    """
+    if not pyarrow_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Columnar export requires pyarrow",
+        )
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start_date must not be after end_date",
+        )
+    
+    query = (
+        select(
+            SalesOrder.id,
+            SalesOrder.product_id,
+            Product.sku,
+            SalesOrder.quantity_sold,
+            SalesOrder.sold_at,
+        )
+        .join(Product, Product.id == SalesOrder.product_id)
+        .order_by(SalesOrder.sold_at, SalesOrder.id)
+    )
+    if start_date:
+        query = query.where(
+            SalesOrder.sold_at >= datetime.combine(start_date, time.min, tzinfo=timezone.utc)
+        )
+    if end_date:
+        query = query.where(
+            SalesOrder.sold_at < datetime.combine(end_date + timedelta(days=1), time.min, tzinfo=timezone.utc)
+        )
+    
+    filename = f"sales.{FILE_EXTENSIONS[export_format]}"
+    return StreamingResponse(
+        stream_export(query, sales_schema(), export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
@@ -3,9 +3,14 @@ from fastapi import APIRouter, HTTPException, status
 from sqlalchemy import func, select
 
 from app.core.dependencies import AdminUser, CurrentUser, DbSession
+from app.database import run_after_commit
 from app.models.category import Category
 from app.models.product import Product
 from app.schemas.category import CategoryCreate, CategoryResponse, CategoryUpdate
+from app.services.autocomplete import autocomplete_index
+from app.services.catalog import bump_catalog_version
+from app.services.category_vocabulary import category_vocabulary
+from app.services.prediction import invalidate_forecasts_on_commit
 
 router = APIRouter(prefix="/api/categories", tags=["Categories"])
 
@@ -60,6 +65,10 @@ async def create_category(
     await db.flush()
     await db.refresh(category)
     
+    # Smart search learns the new category name
+    run_after_commit(db, category_vocabulary.mark_changed)
+    run_after_commit(db, bump_catalog_version)
+    
     response = CategoryResponse.model_validate(category)
     response.product_count = 0
     return response
@@ -127,6 +136,11 @@ async def update_category(
     await db.flush()
     await db.refresh(category)
     
+    # Forecasts, autocomplete entries and smart search embed category names
+    invalidate_forecasts_on_commit(db)
+    run_after_commit(db, autocomplete_index.mark_changed)
+    run_after_commit(db, category_vocabulary.mark_changed)
+    
     # Get product count
     count_result = await db.execute(
         select(func.count(Product.id)).where(Product.category_id == category_id)
@@ -165,3 +179,5 @@ async def delete_category(
         )
     
     await db.delete(category)
+    run_after_commit(db, category_vocabulary.mark_changed)
+    run_after_commit(db, bump_catalog_version)
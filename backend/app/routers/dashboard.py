@@ -2,13 +2,14 @@
 from decimal import Decimal
 from fastapi import APIRouter
 from sqlalchemy import func, select
+from sqlalchemy.orm import selectinload
 
 from app.core.dependencies import CurrentUser, DbSession
-from app.core.cache import cache
 from app.models.category import Category
 from app.models.product import Product
 from app.models.user import UserRole
 from app.schemas.dashboard import CategoryValue, DashboardStats, LowStockItem
+from app.services.dashboard_stats import get_cached_dashboard_stats
 
 router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
 
@@ -19,56 +20,7 @@ async def get_dashboard_stats(
     db: DbSession,
 ) -> DashboardStats:
     """Get aggregate dashboard statistics."""
-    # Check cache first
-    cache_key = f"dashboard_stats_{current_user.role}"
-    cached_data = await cache.get(cache_key)
-    if cached_data:
-        return DashboardStats(**cached_data)
-
-    # Total products
-    products_result = await db.execute(select(func.count(Product.id)))
-    total_products = products_result.scalar() or 0
-    
-    # Total categories
-    categories_result = await db.execute(select(func.count(Category.id)))
-    total_categories = categories_result.scalar() or 0
-    
-    # Low stock count
-    low_stock_result = await db.execute(
-        select(func.count(Product.id)).where(
-            Product.quantity <= Product.low_stock_threshold
-        )
-    )
-    low_stock_count = low_stock_result.scalar() or 0
-    
-    # Total inventory value and quantity
-    value_result = await db.execute(
-        select(
-            func.sum(Product.quantity * Product.unit_price),
-            func.sum(Product.quantity),
-        )
-    )
-    row = value_result.one()
-    total_value = Decimal(row[0]) if row[0] else Decimal(0)
-    total_quantity = row[1] or 0
-    
-    # Staff cannot see total revenue/value
-    if current_user.role == UserRole.STAFF:
-        total_value = Decimal(0)
-    
-    stats = DashboardStats(
-        total_products=total_products,
-        total_categories=total_categories,
-        low_stock_count=low_stock_count,
-        total_inventory_value=total_value,
-        total_quantity=total_quantity,
-    )
-
-    # Cache the result (convert Decimal to float/str for JSON)
-    # Pydantic's .model_dump(mode='json') handles Decimal serialization
-    await cache.set(cache_key, stats.model_dump(mode='json'), expire=60)
-    
-    return stats
+    return await get_cached_dashboard_stats(db, current_user.role)
 
 
 @router.get("/low-stock", response_model=list[LowStockItem])
@@ -80,6 +32,7 @@ async def get_low_stock_items(
     """Get products with low stock for alerts chart."""
     result = await db.execute(
         select(Product)
+        .options(selectinload(Product.category))
         .where(Product.quantity <= Product.low_stock_threshold)
         .order_by(Product.quantity.asc())
         .limit(limit)
@@ -1,26 +1,121 @@
 """Products router with full CRUD and CSV operations."""
+import base64
+import binascii
 import csv
+import hashlib
 import io
+import json
 import math
-from decimal import Decimal
+from collections.abc import AsyncGenerator
+from datetime import datetime
 from fastapi import APIRouter, File, HTTPException, Query, UploadFile, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import func, or_, select
+from sqlalchemy import Select, func, literal, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.core.dependencies import AdminUser, CurrentUser, DbSession
 from app.core.cache import cache
+from app.database import async_session_maker, run_after_commit
 from app.models.product import Product
 from app.models.user import UserRole
 from app.schemas.product import (
+    ImportJobResponse,
     ProductCreate,
     ProductListResponse,
     ProductQuantityUpdate,
     ProductResponse,
     ProductUpdate,
 )
+from app.services.autocomplete import autocomplete_index
+from app.services.catalog import PRODUCT_COUNT_CACHE_PREFIX, invalidate_product_counts
+from app.services.columnar_export import (
+    FILE_EXTENSIONS,
+    MEDIA_TYPES,
+    ExportFormat,
+    product_schema,
+    pyarrow_available,
+    stream_export,
+)
+from app.services.import_jobs import import_job_runner
+from app.services.prediction import invalidate_forecasts_on_commit
+from app.services.product_import import import_products
+from app.services.product_search import get_search_backend
 
 router = APIRouter(prefix="/api/products", tags=["Products"])
 
+# Exact list totals are cached briefly per normalized filter set
+PRODUCT_COUNT_CACHE_TTL = 30
+
+# Rows fetched from the server-side cursor per CSV export chunk
+EXPORT_CHUNK_SIZE = 1000
+
+
+def _encode_cursor(product: Product) -> str:
+    """Encode the (updated_at, id) sort key of a row as an opaque cursor."""
+    payload = json.dumps([product.updated_at.isoformat(), product.id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor produced by _encode_cursor."""
+    try:
+        updated_at, product_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(updated_at), int(product_id)
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+async def _reload_product(db: AsyncSession, product_id: int) -> Product:
+    """Re-read a product after a write, with its category, in one round trip."""
+    result = await db.execute(
+        select(Product)
+        .options(joinedload(Product.category))
+        .where(Product.id == product_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+
+def _count_cache_key(search: str | None, category_id: int | None, low_stock_only: bool) -> str:
+    """Cache key for a filter set; search is case-folded since ILIKE ignores case."""
+    filters = json.dumps([(search or "").lower(), category_id or None, low_stock_only])
+    digest = hashlib.sha1(filters.encode("utf-8")).hexdigest()[:16]
+    return f"{PRODUCT_COUNT_CACHE_PREFIX}{digest}"
+
+
+async def _estimate_count(db: AsyncSession, query: Select) -> int:
+    """Row estimate for `query` from the PostgreSQL planner statistics."""
+    compiled = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def _filter_products(
+    query: Select,
+    search: str | None,
+    category_id: int | None,
+    low_stock_only: bool,
+) -> Select:
+    """Apply the product list filters shared by listing and export."""
+    if search:
+        # Served by the trigram/FTS index where available
+        query = get_search_backend().filter(query, search)
+    
+    if category_id:
+        query = query.where(Product.category_id == category_id)
+    
+    if low_stock_only:
+        query = query.where(Product.quantity <= Product.low_stock_threshold)
+    
+    return query
+
 
 @router.get("", response_model=ProductListResponse)
 async def list_products(
@@ -31,46 +126,119 @@ async def list_products(
     search: str | None = Query(None),
     category_id: int | None = Query(None),
     low_stock_only: bool = Query(False),
+    cursor: str | None = Query(None, description="Keyset cursor from a previous next_cursor; overrides page"),
+    estimate_total: bool = Query(
+        False,
+        description="Use planner statistics for the total (PostgreSQL, unfiltered or category-only listings)",
+    ),
 ) -> ProductListResponse:
-    """List products with pagination, search, and filters."""
-    # Base query
-    query = select(Product)
-    count_query = select(func.count(Product.id))
+    """
+    List products with pagination, search, and filters.
+    
+    Pages are ordered by (updated_at, id) descending. Passing `cursor` seeks
+    directly past the previous page instead of using OFFSET and skips the
+    total count, so walking the whole catalog costs the same per page. In
+    cursor mode `total`, `page` and `total_pages` are returned as null.
+    
+    With `search`, the best matches come first (relevance from the search
+    backend); such results are paged by offset only and `next_cursor` is
+    null, since a keyset cursor cannot follow a relevance score.
+    
+    Otherwise the total comes from a short-lived cache or from a window
+    count fetched with the page itself, never from a separate COUNT(*) pass
+    (except for an empty page past the end). With `estimate_total` on
+    PostgreSQL, unfiltered and category-only listings report the planner's
+    row estimate instead and set `total_estimated`.
+    """
+    if search and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search results are ranked by relevance and cannot be paged by cursor",
+        )
     
-    # Apply filters
+    # Base query (ProductResponse embeds the category)
+    query = select(Product).options(selectinload(Product.category))
     if search:
-        search_filter = or_(
-            Product.name.ilike(f"%{search}%"),
-            Product.sku.ilike(f"%{search}%"),
+        # Best matches first; id keeps offset pages stable between equal scores
+        query = _filter_products(
+            get_search_backend().ranked(query, search), None, category_id, low_stock_only,
+        ).order_by(Product.id)
+    else:
+        query = _filter_products(query, None, category_id, low_stock_only).order_by(
+            Product.updated_at.desc(), Product.id.desc()
         )
-        query = query.where(search_filter)
-        count_query = count_query.where(search_filter)
-    
-    if category_id:
-        query = query.where(Product.category_id == category_id)
-        count_query = count_query.where(Product.category_id == category_id)
-    
-    if low_stock_only:
-        query = query.where(Product.quantity <= Product.low_stock_threshold)
-        count_query = count_query.where(Product.quantity <= Product.low_stock_threshold)
-    
-    # Get total count
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    query = query.limit(page_size)
+    count_query = _filter_products(
+        select(func.count(Product.id)),
+        search, category_id, low_stock_only,
+    )
     
-    # Apply pagination
-    offset = (page - 1) * page_size
-    query = query.order_by(Product.updated_at.desc()).offset(offset).limit(page_size)
+    if cursor:
+        # Keyset seek; the cursor timestamp is bound with the column's type so
+        # it is rendered the same way as stored values
+        last_updated_at, last_id = _decode_cursor(cursor)
+        query = query.where(
+            tuple_(Product.updated_at, Product.id)
+            < tuple_(literal(last_updated_at, Product.updated_at.type), last_id)
+        )
+        result = await db.execute(query)
+        products = result.scalars().all()
+        
+        return ProductListResponse(
+            items=[ProductResponse.model_validate(p) for p in products],
+            total=None,
+            page=None,
+            page_size=page_size,
+            total_pages=None,
+            next_cursor=_encode_cursor(products[-1]) if len(products) == page_size else None,
+        )
     
-    result = await db.execute(query)
-    products = result.scalars().all()
+    query = query.offset((page - 1) * page_size)
+    total: int | None = None
+    total_estimated = False
+    
+    if estimate_total and not search and not low_stock_only and db.bind.dialect.name == "postgresql":
+        estimate_query = select(Product.id)
+        if category_id:
+            estimate_query = estimate_query.where(Product.category_id == category_id)
+        total = await _estimate_count(db, estimate_query)
+        total_estimated = True
+    
+    count_key = _count_cache_key(search, category_id, low_stock_only)
+    if total is None:
+        total = await cache.get(count_key)
+    
+    if total is not None:
+        result = await db.execute(query)
+        products = result.scalars().all()
+    else:
+        # Snapshot the generation first: a write committing while we count
+        # invalidates the namespace, and its stale total must not be cached
+        generation = await cache.generation(PRODUCT_COUNT_CACHE_PREFIX)
+        # Page and exact total in one statement
+        result = await db.execute(query.add_columns(func.count().over().label("total")))
+        rows = result.all()
+        products = [row[0] for row in rows]
+        if rows:
+            total = rows[0][1]
+        elif page == 1:
+            total = 0
+        else:
+            # Past the last page the window count has no row to ride on
+            total_result = await db.execute(count_query)
+            total = total_result.scalar() or 0
+        await cache.set(count_key, total, expire=PRODUCT_COUNT_CACHE_TTL, generation=generation)
     
     return ProductListResponse(
         items=[ProductResponse.model_validate(p) for p in products],
         total=total,
+        total_estimated=total_estimated,
         page=page,
         page_size=page_size,
         total_pages=math.ceil(total / page_size) if total > 0 else 1,
+        next_cursor=(
+            _encode_cursor(products[-1]) if len(products) == page_size and not search else None
+        ),
     )
 
 
@@ -94,12 +262,15 @@ async def create_product(
     product = Product(**product_data.model_dump(), created_by=admin.id)
     db.add(product)
     await db.flush()
-    await db.refresh(product)
+    product = await _reload_product(db, product.id)
     
-    # Invalidate dashboard cache
-    await cache.delete_pattern("dashboard_stats_*")
+    # Invalidate list-total and forecast caches (dashboard stats follow the catalog version)
+    run_after_commit(db, invalidate_product_counts)
+    invalidate_forecasts_on_commit(db)
     
-    return ProductResponse.model_validate(product)
+    response = ProductResponse.model_validate(product)
+    run_after_commit(db, lambda: autocomplete_index.upsert(response))
+    return response
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
@@ -109,7 +280,11 @@ async def get_product(
     db: DbSession,
 ) -> ProductResponse:
     """Get a specific product."""
-    result = await db.execute(select(Product).where(Product.id == product_id))
+    result = await db.execute(
+        select(Product)
+        .options(selectinload(Product.category))
+        .where(Product.id == product_id)
+    )
     product = result.scalar_one_or_none()
     
     if not product:
@@ -154,12 +329,15 @@ async def update_product(
         setattr(product, field, value)
     
     await db.flush()
-    await db.refresh(product)
+    product = await _reload_product(db, product.id)
     
-    # Invalidate dashboard cache
-    await cache.delete_pattern("dashboard_stats_*")
+    # Invalidate list-total and forecast caches (dashboard stats follow the catalog version)
+    run_after_commit(db, invalidate_product_counts)
+    invalidate_forecasts_on_commit(db)
     
-    return ProductResponse.model_validate(product)
+    response = ProductResponse.model_validate(product)
+    run_after_commit(db, lambda: autocomplete_index.upsert(response))
+    return response
 
 
 @router.patch("/{product_id}/quantity", response_model=ProductResponse)
@@ -181,12 +359,15 @@ async def update_product_quantity(
     
     product.quantity = quantity_data.quantity
     await db.flush()
-    await db.refresh(product)
+    product = await _reload_product(db, product.id)
     
-    # Invalidate dashboard cache
-    await cache.delete_pattern("dashboard_stats_*")
+    # Invalidate list-total and forecast caches (dashboard stats follow the catalog version)
+    run_after_commit(db, invalidate_product_counts)
+    invalidate_forecasts_on_commit(db)
     
-    return ProductResponse.model_validate(product)
+    response = ProductResponse.model_validate(product)
+    run_after_commit(db, lambda: autocomplete_index.upsert(response))
+    return response
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -207,20 +388,48 @@ async def delete_product(
     
     await db.delete(product)
     
-    # Invalidate dashboard cache
-    await cache.delete_pattern("dashboard_stats_*")
+    # Invalidate list-total and forecast caches (dashboard stats follow the catalog version)
+    run_after_commit(db, invalidate_product_counts)
+    invalidate_forecasts_on_commit(db)
+    run_after_commit(db, lambda: autocomplete_index.remove(product_id))
 
 
 @router.get("/export/csv")
 async def export_products_csv(
     current_user: CurrentUser,
-    db: DbSession,
+    search: str | None = Query(None),
+    category_id: int | None = Query(None),
+    low_stock_only: bool = Query(False),
 ) -> StreamingResponse:
-    """Export all products as CSV."""
-    result = await db.execute(select(Product).order_by(Product.sku))
-    products = result.scalars().all()
+    """
+    Export products as CSV, optionally filtered like the product list.
+    
+    Rows are streamed from a server-side cursor in chunks of
+    EXPORT_CHUNK_SIZE, so memory stays bounded and the first bytes are sent
+    before the whole table has been read.
+    """
+    query = _filter_products(
+        select(
+            Product.sku,
+            Product.name,
+            Product.description,
+            Product.category_id,
+            Product.quantity,
+            Product.unit_price,
+            Product.low_stock_threshold,
+        ),
+        search, category_id, low_stock_only,
+    ).order_by(Product.sku)
     
-    # Create CSV in memory
+    return StreamingResponse(
+        _stream_products_csv(query),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=products.csv"},
+    )
+
+
+async def _stream_products_csv(query: Select) -> AsyncGenerator[str, None]:
+    """Yield the CSV export chunk by chunk."""
     output = io.StringIO()
     writer = csv.writer(output)
     
@@ -229,20 +438,62 @@ async def export_products_csv(
         "SKU", "Name", "Description", "Category ID", 
         "Quantity", "Unit Price", "Low Stock Threshold"
     ])
+    yield output.getvalue()
     
-    # Data rows
-    for p in products:
-        writer.writerow([
-            p.sku, p.name, p.description or "", p.category_id or "",
-            p.quantity, float(p.unit_price), p.low_stock_threshold
-        ])
-    
-    output.seek(0)
+    # Own session: the stream outlives the request-scoped one
+    async with async_session_maker() as session:
+        result = await session.stream(
+            query.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        async for rows in result.partitions():
+            output.seek(0)
+            output.truncate()
+            for sku, name, description, category_id, quantity, unit_price, threshold in rows:
+                writer.writerow([
+                    sku, name, description or "", category_id or "",
+                    quantity, float(unit_price), threshold
+                ])
+            yield output.getvalue()
+
+
+@router.get("/export/{export_format}")
+async def export_products_columnar(
+    export_format: ExportFormat,
+    current_user: CurrentUser,
+    search: str | None = Query(None),
+    category_id: int | None = Query(None),
+    low_stock_only: bool = Query(False),
+) -> StreamingResponse:
+    """
+    Export products as an Arrow IPC stream or Parquet file, filtered like
+    the product list. Prices keep their exact decimal type.
+    """
+    if not pyarrow_available():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Columnar export requires pyarrow",
+        )
     
+    query = _filter_products(
+        select(
+            Product.sku,
+            Product.name,
+            Product.description,
+            Product.category_id,
+            Product.quantity,
+            Product.unit_price,
+            Product.low_stock_threshold,
+            Product.created_at,
+            Product.updated_at,
+        ),
+        search, category_id, low_stock_only,
+    ).order_by(Product.sku)
+    
+    filename = f"products.{FILE_EXTENSIONS[export_format]}"
     return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=products.csv"},
+        stream_export(query, product_schema(), export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
@@ -259,57 +510,64 @@ async def import_products_csv(
             detail="File must be a CSV",
         )
     
-    content = await file.read()
-    csv_text = content.decode("utf-8")
-    reader = csv.DictReader(io.StringIO(csv_text))
-    
-    created = 0
-    updated = 0
-    errors = []
-    
-    for row_num, row in enumerate(reader, start=2):  # Start at 2 (header is row 1)
-        try:
-            sku = row.get("SKU", "").strip()
-            if not sku:
-                errors.append(f"Row {row_num}: Missing SKU")
-                continue
-            
-            # Check if product exists
-            existing = await db.execute(
-                select(Product).where(Product.sku == sku)
-            )
-            product = existing.scalar_one_or_none()
-            
-            product_data = {
-                "name": row.get("Name", "").strip() or sku,
-                "description": row.get("Description", "").strip() or None,
-                "category_id": int(row["Category ID"]) if row.get("Category ID") else None,
-                "quantity": int(row.get("Quantity", 0)),
-                "unit_price": Decimal(row.get("Unit Price", 0)),
-                "low_stock_threshold": int(row.get("Low Stock Threshold", 10)),
-            }
-            
-            if product:
-                # Update existing
-                for field, value in product_data.items():
-                    setattr(product, field, value)
-                updated += 1
-            else:
-                # Create new
-                product = Product(sku=sku, **product_data, created_by=admin.id)
-                db.add(product)
-                created += 1
-        
-        except (ValueError, KeyError) as e:
-            errors.append(f"Row {row_num}: {str(e)}")
+    # Parse straight from the spooled upload instead of reading it all first
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        result = await import_products(db, stream, created_by=admin.id)
+    finally:
+        stream.detach()
     
-    await db.flush()
-    
-    # Invalidate dashboard cache
-    await cache.delete_pattern("dashboard_stats_*")
+    # Invalidate list-total and forecast caches (dashboard stats follow the catalog version)
+    run_after_commit(db, invalidate_product_counts)
+    invalidate_forecasts_on_commit(db)
+    run_after_commit(db, autocomplete_index.mark_changed)
     
     return {
-        "created": created,
-        "updated": updated,
-        "errors": errors[:10],  # Limit error messages
+        "created": result.created,
+        "updated": result.updated,
+        "unchanged": result.unchanged,
+        "errors": result.errors[:10],  # Limit error messages
     }
+
+
+
+@router.post(
+    "/import/jobs",
+    response_model=ImportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def start_import_job(
+    admin: AdminUser,
+    file: UploadFile = File(...),
+) -> ImportJobResponse:
+    """
+    Import products from CSV in the background (Admin only).
+    
+    The upload is spooled to disk and imported in committed chunks; poll
+    GET /api/products/import/jobs/{job_id} for progress.
+    """
+    if not file.filename or not file.filename.endswith(".csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be a CSV",
+        )
+    
+    job = await import_job_runner.submit(file, created_by=admin.id)
+    return ImportJobResponse.model_validate(job)
+
+
+@router.get("/import/jobs/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(
+    job_id: str,
+    admin: AdminUser,
+) -> ImportJobResponse:
+    """Progress of a background import (Admin only)."""
+    job = await import_job_runner.get(job_id)
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found",
+        )
+    
+    return ImportJobResponse.model_validate(job)
@@ -1,14 +1,18 @@
 """Smart search router with natural language query support."""
 from fastapi import APIRouter, Query, Request
 from pydantic import BaseModel
-from sqlalchemy import select, or_
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.core.dependencies import CurrentUser, DbSession
-from app.core.limiter import limiter, AI_SEARCH_LIMIT
+from app.core.limiter import limiter, consume_ai_budget, DEFAULT_LIMIT
 from app.models.product import Product
 from app.models.category import Category
+from app.services.autocomplete import autocomplete_index, prefix_match
 from app.services.llm_search import query_parser, ParsedQuery
+from app.services.product_search import get_search_backend
+from app.services.search_cache import search_result_cache
 from app.schemas.product import ProductResponse
 
 
@@ -23,13 +27,14 @@ class SmartSearchResponse(BaseModel):
     total: int
     parsed_query: dict
     parse_method: str
+    confidence: float | None = None
 
 
 router = APIRouter(prefix="/api/search", tags=["Search"])
 
 
 @router.post("/smart", response_model=SmartSearchResponse)
-@limiter.limit(AI_SEARCH_LIMIT)
+@limiter.limit(DEFAULT_LIMIT)
 async def smart_search(
     request: Request,  # Required by limiter
     body: SmartSearchRequest,
@@ -44,10 +49,31 @@ async def smart_search(
     - "low stock items"
     - "products under $50"
     - "expensive furniture"
+    
+    Queries the rule-based parser understands never reach the LLM; the rest
+    use the LLM while the client's AI_SEARCH_LIMIT budget lasts.
     """
     # Parse the natural language query
-    parsed = await query_parser.parse(body.query)
+    parsed = await query_parser.parse(body.query, allow_llm=lambda: consume_ai_budget(request))
+    
+    # Same filters at the same catalog version: reuse the result set
+    cache_key = await search_result_cache.key_for(parsed)
+    results = await search_result_cache.get(cache_key)
+    if results is None:
+        results = await _run_search(db, parsed)
+        await search_result_cache.set(cache_key, results)
     
+    return SmartSearchResponse(
+        results=results,
+        total=len(results),
+        parsed_query=parsed.filters(),
+        parse_method=parsed.parse_method,
+        confidence=parsed.confidence,
+    )
+
+
+async def _run_search(db: AsyncSession, parsed: ParsedQuery) -> list[ProductResponse]:
+    """Execute the product query for a set of parsed filters."""
     # Build SQLAlchemy query
     query = select(Product).options(selectinload(Product.category))
     
@@ -55,7 +81,7 @@ async def smart_search(
     conditions = []
     
     if parsed.name_contains:
-        conditions.append(Product.name.ilike(f"%{parsed.name_contains}%"))
+        query = get_search_backend().filter_name(query, parsed.name_contains)
     
     if parsed.category_contains:
         # Join with category and filter
@@ -95,22 +121,7 @@ async def smart_search(
     
     # Execute
     result = await db.execute(query)
-    products = result.scalars().all()
-    
-    return SmartSearchResponse(
-        results=[ProductResponse.model_validate(p) for p in products],
-        total=len(products),
-        parsed_query={
-            "name_contains": parsed.name_contains,
-            "category_contains": parsed.category_contains,
-            "min_price": parsed.min_price,
-            "max_price": parsed.max_price,
-            "low_stock": parsed.low_stock,
-            "sort_by": parsed.sort_by,
-            "sort_order": parsed.sort_order,
-        },
-        parse_method=parsed.parse_method,
-    )
+    return [ProductResponse.model_validate(p) for p in result.scalars().all()]
 
 
 @router.get("/products")
@@ -119,16 +130,20 @@ async def search_products(
     db: DbSession,
     q: str = Query(..., min_length=1, description="Search query"),
 ) -> list[ProductResponse]:
-    """Simple text search for products (for autocomplete)."""
+    """
+    Simple text search for products (for autocomplete), best matches first.
+    
+    Served from the in-process prefix index; falls back to SQL while the
+    index is warming up, with the same prefix semantics (the search backend
+    narrows the candidates, which must then start with the term).
+    """
+    indexed = await autocomplete_index.search(q, limit=10)
+    if indexed is not None:
+        return indexed
+    
+    query = select(Product).options(selectinload(Product.category))
     result = await db.execute(
-        select(Product)
-        .where(
-            or_(
-                Product.name.ilike(f"%{q}%"),
-                Product.sku.ilike(f"%{q}%"),
-            )
-        )
-        .limit(10)
+        get_search_backend().ranked(query, q).where(prefix_match(q)).limit(10)
     )
     products = result.scalars().all()
     return [ProductResponse.model_validate(p) for p in products]
@@ -53,7 +53,28 @@ class ProductResponse(ProductBase):
 class ProductListResponse(BaseModel):
     """Schema for paginated product list."""
     items: list[ProductResponse]
-    total: int
-    page: int
+    total: int | None  # None in cursor mode (not computed)
+    total_estimated: bool = False  # True when total is a planner estimate
+    page: int | None  # None in cursor mode
     page_size: int
-    total_pages: int
+    total_pages: int | None  # None in cursor mode
+    next_cursor: str | None = None  # Opaque keyset cursor for the next page
+
+
+class ImportJobResponse(BaseModel):
+    """Schema for background import job status."""
+    id: str
+    filename: str
+    status: str  # queued, running, completed, failed
+    rows_processed: int
+    created: int
+    updated: int
+    unchanged: int  # Rows identical to the stored product (not written)
+    error_count: int
+    errors: list[str]
+    progress: float  # 0..1, by bytes of the uploaded file
+    rows_per_second: float | None
+    eta_seconds: float | None
+    message: str | None = None  # Failure reason
+    
+    model_config = {"from_attributes": True}
@@ -1,6 +1,23 @@
 """Services package."""
 from app.services.seed import seed_initial_data
 from app.services.seed_analytics import seed_sales_history
+from app.services.sales_rollup import (
+    backfill_sales_rollup,
+    compact_sales_orders,
+    record_sale,
+    record_sales,
+    run_compaction_loop,
+    sync_sales_rollup,
+)
 
-__all__ = ["seed_initial_data", "seed_sales_history"]
+__all__ = [
+    "seed_initial_data",
+    "seed_sales_history",
+    "backfill_sales_rollup",
+    "compact_sales_orders",
+    "record_sale",
+    "record_sales",
+    "run_compaction_loop",
+    "sync_sales_rollup",
+]
 
@@ -0,0 +1,153 @@
+"""In-process prefix index for product autocomplete.
+
+Holds a sorted array of (token, product_id) pairs built from SKUs, name words
+and full names, so a top-N prefix lookup is a binary search plus a short scan
+instead of a database query. Each worker keeps its own copy. Local writes are
+applied in place after commit, and writes made by other workers are detected
+by comparing the shared catalog version (see app.services.catalog).
+"""
+from bisect import bisect_left, insort
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import selectinload
+
+from app.database import async_session_maker
+from app.models.product import Product
+from app.schemas.product import ProductResponse
+from app.services.catalog import bump_catalog_version, get_catalog_version
+from app.services.versioned_index import VersionedIndex
+
+
+def _tokens(product: ProductResponse) -> set[str]:
+    """Index terms for a product: SKU, full name and each name word."""
+    name = product.name.lower()
+    tokens = {product.sku.lower(), name}
+    tokens.update(word for word in name.split() if word)
+    return tokens
+
+
+def prefix_match(prefix: str):
+    """
+    SQL condition equivalent to an index lookup: SKU, full name or a name
+    word starts with `prefix` (used while the index is warming up).
+    """
+    return or_(
+        Product.sku.istartswith(prefix, autoescape=True),
+        Product.name.istartswith(prefix, autoescape=True),
+        Product.name.icontains(f" {prefix}", autoescape=True),
+    )
+
+
+class AutocompleteIndex(VersionedIndex):
+    """Sorted-array prefix index over product SKUs and names."""
+
+    label = "Autocomplete"
+
+    def __init__(self) -> None:
+        super().__init__()  # Version stays None until built
+        self._entries: list[tuple[str, int]] = []
+        self._products: dict[int, ProductResponse] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self._version is not None
+
+    async def current_version(self) -> int:
+        return await get_catalog_version()
+
+    async def build(self) -> None:
+        """Load every product and replace the index contents."""
+        version = await get_catalog_version()
+        async with async_session_maker() as session:
+            result = await session.execute(
+                select(Product).options(selectinload(Product.category))
+            )
+            products = [ProductResponse.model_validate(p) for p in result.scalars().all()]
+
+        entries: list[tuple[str, int]] = []
+        for product in products:
+            entries.extend((token, product.id) for token in _tokens(product))
+        entries.sort()
+
+        self._entries = entries
+        self._products = {p.id: p for p in products}
+        self._version = version
+        print(f"🔎 Autocomplete index built ({len(products)} products)")
+
+    def invalidate(self) -> None:
+        """Drop the index; lookups fall back to SQL until it is rebuilt."""
+        self._version = None
+        if self._active:
+            self.warm()
+
+    async def search(self, prefix: str, limit: int = 10) -> list[ProductResponse] | None:
+        """
+        Top `limit` products with a token starting with `prefix`.
+
+        Returns None while the index is warming so the caller can use SQL.
+        """
+        if not self.ready:
+            return None
+        if await self.version_moved():
+            self.invalidate()
+        if not self.ready:
+            return None
+
+        prefix = prefix.lower()
+        results: list[ProductResponse] = []
+        seen: set[int] = set()
+        position = bisect_left(self._entries, (prefix, -1))
+        for token, product_id in self._entries[position:]:
+            if not token.startswith(prefix):
+                break
+            if product_id not in seen:
+                seen.add(product_id)
+                results.append(self._products[product_id])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _remove(self, product_id: int) -> None:
+        old = self._products.pop(product_id, None)
+        if old is None:
+            return
+        for token in _tokens(old):
+            position = bisect_left(self._entries, (token, product_id))
+            if position < len(self._entries) and self._entries[position] == (token, product_id):
+                del self._entries[position]
+
+    async def _apply(self, change) -> None:
+        """Apply a local change and adopt the bumped catalog version."""
+        previous = self._version
+        new_version = await bump_catalog_version()
+        if previous is None:
+            return
+        change()
+        if new_version == previous + 1:
+            self._version = new_version
+        else:
+            # Someone else wrote in between: our copy may be missing their change
+            self.invalidate()
+
+    async def upsert(self, product: ProductResponse) -> None:
+        """Index a created or updated product."""
+        def change() -> None:
+            self._remove(product.id)
+            self._products[product.id] = product
+            for token in _tokens(product):
+                insort(self._entries, (token, product.id))
+
+        await self._apply(change)
+
+    async def remove(self, product_id: int) -> None:
+        """Drop a deleted product."""
+        await self._apply(lambda: self._remove(product_id))
+
+    async def mark_changed(self) -> None:
+        """Bulk or category change: bump the version and rebuild from the DB."""
+        await bump_catalog_version()
+        self.invalidate()
+
+
+# Singleton instance
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,79 @@
+"""Catalog data version shared by all workers.
+
+Bumped on every product or category write. In-process indexes and result
+caches compare it with the version they were built from to detect writes
+made by other workers.
+"""
+import time
+
+from app.core.cache import cache
+from app.services.versioned_index import VERSION_CHECK_INTERVAL
+
+CATALOG_VERSION_KEY = "catalog_version"
+
+# Bumped on category writes only (smart-search category vocabulary)
+CATEGORY_VERSION_KEY = "category_version"
+
+# Cached product list totals (see routers.products.list_products)
+PRODUCT_COUNT_CACHE_PREFIX = "product_count_"
+
+# Fallback counters while Redis is unavailable (single process only)
+_local_versions: dict[str, int] = {}
+
+# Last version this worker read or bumped, by key, with when it was seen
+_seen_versions: dict[str, tuple[int, float]] = {}
+
+
+async def _get_version(key: str) -> int:
+    """Current value of a version counter (Redis when connected, in-process otherwise)."""
+    if cache.redis:
+        value = await cache.get(key)
+        if value is not None:
+            return int(value)
+    return _local_versions.get(key, 0)
+
+
+async def _bump_version(key: str) -> int:
+    version = await cache.incr(key)
+    if version is None:
+        version = _local_versions[key] = _local_versions.get(key, 0) + 1
+    _seen_versions[key] = (version, time.monotonic())
+    return version
+
+
+async def get_catalog_version() -> int:
+    """Current catalog version."""
+    return await _get_version(CATALOG_VERSION_KEY)
+
+
+async def get_recent_catalog_version() -> int:
+    """
+    Catalog version for hot read paths: re-read at most every
+    VERSION_CHECK_INTERVAL seconds, while this worker's own bumps are seen
+    at once.
+    """
+    seen = _seen_versions.get(CATALOG_VERSION_KEY)
+    now = time.monotonic()
+    if seen is None or now - seen[1] >= VERSION_CHECK_INTERVAL:
+        seen = _seen_versions[CATALOG_VERSION_KEY] = (await get_catalog_version(), now)
+    return seen[0]
+
+
+async def bump_catalog_version() -> int:
+    """Mark the catalog as changed and return the new version."""
+    return await _bump_version(CATALOG_VERSION_KEY)
+
+
+async def get_category_version() -> int:
+    """Current version of the category name list."""
+    return await _get_version(CATEGORY_VERSION_KEY)
+
+
+async def bump_category_version() -> int:
+    """Mark category names as changed and return the new version."""
+    return await _bump_version(CATEGORY_VERSION_KEY)
+
+
+async def invalidate_product_counts() -> None:
+    """Drop cached list totals (after product writes commit)."""
+    await cache.delete_pattern(f"{PRODUCT_COUNT_CACHE_PREFIX}*")
@@ -0,0 +1,155 @@
+"""Category vocabulary for the rule-based smart-search parser.
+
+Category names (plus their singular/plural variants) are compiled into an Aho-Corasick automaton over word tokens, so finding every
+category mentioned in a query is one pass over its words, however many
+categories exist. Names are loaded from the categories table; each worker
+keeps its own automaton and rebuilds it when the shared category version
+(see app.services.catalog) moves.
+"""
+from collections import deque
+from collections.abc import Iterable
+
+from sqlalchemy import select
+
+from app.database import async_session_maker
+from app.models.category import Category
+from app.services.catalog import bump_category_version, get_category_version
+from app.services.versioned_index import VersionedIndex
+
+# Used until the table has been loaded (and when it is empty)
+DEFAULT_CATEGORIES = (
+    "electronics", "clothing", "food", "furniture", "toys", "books", "sports", "health",
+)
+
+_PUNCTUATION = ".,!?;:\"'()[]{}"
+
+
+def split_words(text: str) -> list[str]:
+    """Lowercase words with surrounding punctuation removed."""
+    words = (word.strip(_PUNCTUATION) for word in text.lower().split())
+    return [word for word in words if word]
+
+
+def _variants(words: list[str]) -> list[tuple[str, ...]]:
+    """The phrase plus its naive singular/plural form ("toys" <-> "toy")."""
+    last = words[-1]
+    other = last[:-1] if last.endswith("s") and len(last) > 3 else f"{last}s"
+    return [tuple(words), tuple(words[:-1] + [other])]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton matching multi-word phrases in a token list."""
+
+    def __init__(self, phrases: dict[tuple[str, ...], str]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, str]]] = [[]]  # (phrase length, value)
+
+        for phrase, value in phrases.items():
+            state = 0
+            for word in phrase:
+                next_state = self._goto[state].get(word)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][word] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append((len(phrase), value))
+
+        # Breadth-first failure links; outputs inherit their fallback's outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(word, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find(self, words: list[str]) -> list[tuple[int, int, str]]:
+        """Every (start, end, value) phrase occurrence in `words`."""
+        matches = []
+        state = 0
+        for position, word in enumerate(words):
+            while state and word not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(word, 0)
+            for length, value in self._out[state]:
+                matches.append((position + 1 - length, position + 1, value))
+        return matches
+
+
+def build_automaton(names: Iterable[str]) -> KeywordAutomaton:
+    """Automaton mapping each name and its variants to the lowercase name."""
+    phrases: dict[tuple[str, ...], str] = {}
+    for name in names:
+        words = split_words(name)
+        if not words:
+            continue
+        canonical = " ".join(words)
+        for phrase in _variants(words):
+            phrases.setdefault(phrase, canonical)
+    return KeywordAutomaton(phrases)
+
+
+class CategoryVocabulary(VersionedIndex):
+    """Category names known to the parser, rebuilt when categories change."""
+
+    label = "Category vocabulary"
+
+    def __init__(self) -> None:
+        super().__init__(version=0)
+        self._automaton = build_automaton(DEFAULT_CATEGORIES)
+
+    @property
+    def version(self) -> int:
+        """Category version the current automaton was built from."""
+        return self._version
+
+    async def current_version(self) -> int:
+        return await get_category_version()
+
+    def load(self, names: Iterable[str], version: int = 0) -> None:
+        """Replace the vocabulary (defaults when `names` is empty)."""
+        names = list(names) or list(DEFAULT_CATEGORIES)
+        self._automaton = build_automaton(names)
+        self._version = version
+
+    async def build(self) -> None:
+        """Load category names from the database."""
+        version = await get_category_version()
+        async with async_session_maker() as session:
+            result = await session.execute(select(Category.name))
+            names = list(result.scalars().all())
+        self.load(names, version=version)
+        print(f"🏷️ Category vocabulary built ({len(names)} categories)")
+
+    async def refresh(self) -> None:
+        """Rebuild if another worker changed categories since our build."""
+        if self._active and await self.version_moved():
+            self.warm()
+
+    async def mark_changed(self) -> None:
+        """Category created, renamed or deleted (after commit)."""
+        await bump_category_version()
+        if self._active:
+            self.warm()
+
+    def match(self, words: list[str]) -> tuple[int, int, str] | None:
+        """Leftmost (then longest) category mention in `words`."""
+        matches = self._automaton.find(words)
+        if not matches:
+            return None
+        return min(matches, key=lambda m: (m[0], m[0] - m[1]))
+
+
+# Singleton instance
+category_vocabulary = CategoryVocabulary()
@@ -0,0 +1,144 @@
+"""Apache Arrow IPC and Parquet exports.
+
+Rows are read from a server-side cursor in batches of EXPORT_BATCH_ROWS,
+converted to Arrow record batches and written to the response as they are
+produced, so memory stays bounded by one batch. Prices use decimal128, so
+values stay exact (no float conversion).
+
+pyarrow is an optional dependency (`pip install inventory-api[export]`);
+without it the endpoints answer 501.
+"""
+import io
+from collections.abc import AsyncGenerator
+from typing import Literal
+
+from sqlalchemy import Select
+
+from app.database import async_session_maker
+
+ExportFormat = Literal["arrow", "parquet"]
+
+MEDIA_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+FILE_EXTENSIONS = {
+    "arrow": "arrows",
+    "parquet": "parquet",
+}
+
+# Rows per record batch (one Parquet row group per batch)
+EXPORT_BATCH_ROWS = 10000
+
+
+def pyarrow_available() -> bool:
+    """Whether the optional pyarrow dependency is installed."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def product_schema():
+    """Arrow schema for product exports."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("sku", pa.string()),
+        ("name", pa.string()),
+        ("description", pa.string()),
+        ("category_id", pa.int32()),
+        ("quantity", pa.int32()),
+        ("unit_price", pa.decimal128(10, 2)),
+        ("low_stock_threshold", pa.int32()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def sales_schema():
+    """Arrow schema for sales order exports."""
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("product_id", pa.int32()),
+        ("sku", pa.string()),
+        ("quantity_sold", pa.int32()),
+        ("sold_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands out what was written since the last drain.
+
+    Keeps the absolute position for tell(), which the Parquet writer uses to
+    record column chunk offsets.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._parts: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _writer(export_format: ExportFormat, sink: _ChunkSink, schema):
+    import pyarrow as pa
+
+    if export_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(sink, schema)
+    return pa.ipc.new_stream(sink, schema)
+
+
+async def stream_export(
+    query: Select,
+    schema,
+    export_format: ExportFormat,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Yield `query` results encoded as Arrow IPC stream or Parquet bytes.
+
+    The selected columns must match `schema` in order. Uses its own session
+    because the stream outlives the request-scoped one.
+    """
+    import pyarrow as pa
+
+    sink = _ChunkSink()
+    writer = _writer(export_format, sink, schema)
+    try:
+        async with async_session_maker() as session:
+            result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+            async for rows in result.partitions():
+                columns = list(zip(*rows))
+                batch = pa.RecordBatch.from_arrays(
+                    [pa.array(column, type=f.type) for column, f in zip(columns, schema)],
+                    schema=schema,
+                )
+                writer.write_batch(batch)
+                if data := sink.drain():
+                    yield data
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,125 @@
+"""Dashboard statistics with stale-while-revalidate caching.
+
+Each role's stats are cached together with the catalog version (see
+app.services.catalog) they were computed from. A cached entry becomes
+stale after `dashboard_stats_soft_ttl` seconds or once a product or
+category write bumps the catalog version (at once for this worker's
+writes, within VERSION_CHECK_INTERVAL for other workers'). Stale stats are
+still returned immediately while one background task, guarded by a
+cross-worker lock, recomputes them. Only a missing entry (first request, or no successful
+refresh for `dashboard_stats_hard_ttl` seconds) is computed in the request.
+"""
+import asyncio
+import time
+from decimal import Decimal
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.core.cache import cache
+from app.database import async_session_maker
+from app.models.category import Category
+from app.models.product import Product
+from app.models.user import UserRole
+from app.schemas.dashboard import DashboardStats
+from app.services.catalog import get_catalog_version, get_recent_catalog_version
+
+settings = get_settings()
+
+DASHBOARD_STATS_PREFIX = "dashboard_stats_"
+
+# A refresh that takes longer than this loses the lock to another worker
+REFRESH_LOCK_TTL = 30
+
+# Background refreshes running in this process, by role
+_refresh_tasks: dict[str, asyncio.Task] = {}
+
+
+async def compute_dashboard_stats(db: AsyncSession, role: str) -> DashboardStats:
+    """Run the aggregate queries behind the dashboard cards."""
+    # Total products
+    products_result = await db.execute(select(func.count(Product.id)))
+    total_products = products_result.scalar() or 0
+
+    # Total categories
+    categories_result = await db.execute(select(func.count(Category.id)))
+    total_categories = categories_result.scalar() or 0
+
+    # Low stock count
+    low_stock_result = await db.execute(
+        select(func.count(Product.id)).where(
+            Product.quantity <= Product.low_stock_threshold
+        )
+    )
+    low_stock_count = low_stock_result.scalar() or 0
+
+    # Total inventory value and quantity
+    value_result = await db.execute(
+        select(
+            func.sum(Product.quantity * Product.unit_price),
+            func.sum(Product.quantity),
+        )
+    )
+    row = value_result.one()
+    total_value = Decimal(row[0]) if row[0] else Decimal(0)
+    total_quantity = row[1] or 0
+
+    # Staff cannot see total revenue/value
+    if role == UserRole.STAFF:
+        total_value = Decimal(0)
+
+    return DashboardStats(
+        total_products=total_products,
+        total_categories=total_categories,
+        low_stock_count=low_stock_count,
+        total_inventory_value=total_value,
+        total_quantity=total_quantity,
+    )
+
+
+async def _compute_and_store(db: AsyncSession, role: str) -> DashboardStats:
+    # Read the version first: a write landing mid-computation marks the result stale
+    version = await get_catalog_version()
+    stats = await compute_dashboard_stats(db, role)
+    entry = {
+        "stats": stats.model_dump(mode="json"),
+        "version": version,
+        "computed_at": time.time(),
+    }
+    await cache.set(f"{DASHBOARD_STATS_PREFIX}{role}", entry, expire=settings.dashboard_stats_hard_ttl)
+    return stats
+
+
+async def _refresh(role: str) -> None:
+    """Recompute one role's stats in the background (one worker at a time)."""
+    lock_name = f"{DASHBOARD_STATS_PREFIX}refresh_{role}"
+    token = await cache.lock(lock_name, REFRESH_LOCK_TTL)
+    if token is None:
+        return  # Another worker is already refreshing
+    try:
+        async with async_session_maker() as session:
+            await _compute_and_store(session, role)
+    except Exception as e:
+        print(f"⚠️ Dashboard stats refresh failed: {e}")
+    finally:
+        await cache.unlock(lock_name, token)
+
+
+def _schedule_refresh(role: str) -> None:
+    task = _refresh_tasks.get(role)
+    if task and not task.done():
+        return
+    _refresh_tasks[role] = asyncio.create_task(_refresh(role))
+
+
+async def get_cached_dashboard_stats(db: AsyncSession, role: str) -> DashboardStats:
+    """Cached dashboard stats; stale ones are served while being refreshed."""
+    entry = await cache.get(f"{DASHBOARD_STATS_PREFIX}{role}")
+    if entry is None:
+        return await _compute_and_store(db, role)
+
+    age = time.time() - entry["computed_at"]
+    if age > settings.dashboard_stats_soft_ttl or entry["version"] != await get_recent_catalog_version():
+        _schedule_refresh(role)
+    return DashboardStats(**entry["stats"])
@@ -0,0 +1,242 @@
+"""Background CSV import jobs.
+
+An upload is spooled to disk and gets a job id. A worker then imports it in
+chunks, committing each chunk, so a bad row late in a large file does not
+roll back everything before it. Progress is stored in the job record, and
+catalog caches are invalidated once when the job finishes.
+
+Jobs run in the receiving process by default. With `import_queue = "redis"`
+job ids are pushed onto a Redis list and picked up by whichever worker's
+consumer is free. Job records then live in Redis too, so any worker can
+report status. The spool directory must then be on storage shared by all
+workers.
+"""
+import asyncio
+import io
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+
+from fastapi import UploadFile
+
+from app.config import get_settings
+from app.core.cache import cache
+from app.database import async_session_maker
+from app.services.autocomplete import autocomplete_index
+from app.services.catalog import invalidate_product_counts
+from app.services.prediction import invalidate_forecast_cache
+from app.services.product_import import IMPORT_CHUNK_SIZE, iter_row_batches, upsert_chunk
+
+settings = get_settings()
+
+IMPORT_JOB_PREFIX = "import_job_"
+IMPORT_QUEUE_KEY = "import_jobs_queue"
+
+# Upload bytes copied to the spool file per read
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+# Error messages kept on the job record (the count is always exact)
+MAX_JOB_ERRORS = 10
+
+
+@dataclass
+class ImportJob:
+    """State of one background import."""
+    id: str
+    filename: str
+    path: str
+    created_by: int | None
+    size_bytes: int
+    status: str = "queued"  # queued, running, completed, failed
+    bytes_processed: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    error_count: int = 0
+    errors: list[str] = field(default_factory=list)
+    message: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    @property
+    def rows_processed(self) -> int:
+        return self.created + self.updated + self.unchanged + self.error_count
+
+    @property
+    def progress(self) -> float:
+        """Fraction of the file consumed (by bytes)."""
+        if self.finished or not self.size_bytes:
+            return 1.0 if self.finished else 0.0
+        return min(self.bytes_processed / self.size_bytes, 1.0)
+
+    @property
+    def rows_per_second(self) -> float | None:
+        if self.started_at is None:
+            return None
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else None
+
+    @property
+    def eta_seconds(self) -> float | None:
+        """Remaining time, extrapolated from the bytes consumed so far."""
+        if self.finished:
+            return 0.0
+        if self.started_at is None or not self.bytes_processed:
+            return None
+        elapsed = time.time() - self.started_at
+        remaining = self.size_bytes - self.bytes_processed
+        return round(elapsed * remaining / self.bytes_processed, 1)
+
+
+async def _invalidate_catalog_caches() -> None:
+    """Drop every cache derived from products, once per job."""
+    await invalidate_product_counts()
+    await invalidate_forecast_cache()
+    await autocomplete_index.mark_changed()
+
+
+class ImportJobRunner:
+    """Spools uploads, queues jobs and runs them chunk by chunk."""
+
+    def __init__(self) -> None:
+        self._jobs: dict[str, ImportJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._consumer: asyncio.Task | None = None
+
+    @property
+    def _use_redis(self) -> bool:
+        return settings.import_queue == "redis" and cache.redis is not None
+
+    def _spool_dir(self) -> str:
+        path = settings.import_spool_dir or os.path.join(tempfile.gettempdir(), "inventory-imports")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    async def _save(self, job: ImportJob) -> None:
+        self._jobs[job.id] = job
+        if self._use_redis:
+            await cache.set(
+                f"{IMPORT_JOB_PREFIX}{job.id}",
+                asdict(job),
+                expire=settings.import_job_ttl_seconds,
+            )
+        if job.finished:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than the job TTL."""
+        cutoff = time.time() - settings.import_job_ttl_seconds
+        for job_id in [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
+
+    async def get(self, job_id: str) -> ImportJob | None:
+        """Current state of a job, from any worker when Redis is in use."""
+        if self._use_redis:
+            data = await cache.get(f"{IMPORT_JOB_PREFIX}{job_id}")
+            if data:
+                return ImportJob(**data)
+        return self._jobs.get(job_id)
+
+    async def submit(self, upload: UploadFile, created_by: int | None) -> ImportJob:
+        """Spool an upload to disk and queue it for import."""
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self._spool_dir(), f"{job_id}.csv")
+        size = 0
+        with open(path, "wb") as spool:
+            while data := await upload.read(SPOOL_CHUNK_BYTES):
+                spool.write(data)
+                size += len(data)
+
+        job = ImportJob(
+            id=job_id,
+            filename=upload.filename or "",
+            path=path,
+            created_by=created_by,
+            size_bytes=size,
+        )
+        await self._save(job)
+
+        if not (self._use_redis and await cache.push(IMPORT_QUEUE_KEY, job.id)):
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: ImportJob) -> None:
+        """Import a spooled file, committing and reporting after each chunk."""
+        job.status = "running"
+        job.started_at = time.time()
+        await self._save(job)
+
+        errors: list[str] = []
+        try:
+            with open(job.path, "rb") as binary:
+                stream = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+                async for batch in iter_row_batches(stream, errors, IMPORT_CHUNK_SIZE):
+                    async with async_session_maker() as session:
+                        created, updated, unchanged = await upsert_chunk(
+                            session, [values for _, values in batch], job.created_by
+                        )
+                        await session.commit()
+                    job.created += created
+                    job.updated += updated
+                    job.unchanged += unchanged
+                    job.bytes_processed = binary.tell()
+                    job.error_count = len(errors)
+                    job.errors = errors[:MAX_JOB_ERRORS]
+                    await self._save(job)
+            job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.message = str(e)
+            print(f"⚠️ Import job {job.id} failed: {e}")
+        finally:
+            job.error_count = len(errors)
+            job.errors = errors[:MAX_JOB_ERRORS]
+            job.finished_at = time.time()
+            await self._save(job)
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+        # Committed chunks stay even if the job failed part-way
+        if job.created or job.updated:
+            await _invalidate_catalog_caches()
+
+    async def _consume(self) -> None:
+        """Take job ids from the Redis queue and run them, until cancelled."""
+        while True:
+            if not cache.redis:
+                await asyncio.sleep(5)
+                continue
+            job_id = await cache.pop(IMPORT_QUEUE_KEY)
+            if job_id is None:
+                continue
+            job = await self.get(job_id)
+            if job and job.status == "queued":
+                await self._run(job)
+
+    def start(self) -> None:
+        """Start consuming the shared queue (Redis mode only)."""
+        if settings.import_queue == "redis" and self._consumer is None:
+            self._consumer = asyncio.create_task(self._consume())
+
+    def stop(self) -> None:
+        if self._consumer:
+            self._consumer.cancel()
+            self._consumer = None
+
+
+# Singleton instance
+import_job_runner = ImportJobRunner()
@@ -1,9 +1,15 @@
 """Natural Language Query Parser using Gemini AI and Regex Fallback."""
+import asyncio
+import hashlib
 import re
 import json
-from dataclasses import dataclass, field
-from typing import Optional
+import time
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Optional
 from app.config import get_settings
+from app.core.cache import cache
+from app.services.category_vocabulary import category_vocabulary, split_words
 
 settings = get_settings()
 
@@ -20,6 +26,143 @@ class ParsedQuery:
     sort_order: str = "asc"
     raw_query: str = ""
     parse_method: str = "none"  # "ai", "regex", "none"
+    confidence: Optional[float] = None  # Share of the query the regex parser explained
+    
+    def filters(self) -> dict:
+        """The fields the search query is built from."""
+        return {
+            "name_contains": self.name_contains,
+            "category_contains": self.category_contains,
+            "min_price": self.min_price,
+            "max_price": self.max_price,
+            "low_stock": self.low_stock,
+            "sort_by": self.sort_by,
+            "sort_order": self.sort_order,
+        }
+    
+    def canonical_key(self) -> str:
+        """
+        Stable text of the filters, shared by differently worded questions
+        with the same meaning (case, spacing and unused sort order folded).
+        """
+        filters = self.filters()
+        for name in ("name_contains", "category_contains"):
+            if filters[name]:
+                filters[name] = " ".join(filters[name].lower().split())
+        for name in ("min_price", "max_price"):
+            if filters[name] is not None:
+                filters[name] = float(filters[name])
+        if not filters["sort_by"]:
+            filters["sort_order"] = None
+        return json.dumps(filters, sort_keys=True, separators=(",", ":"))
+
+
+PARSED_QUERY_CACHE_PREFIX = "parsed_query_"
+
+_NUMBER = re.compile(r"\$?(\d[\d,]*(?:\.\d+)?)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _fold_number(match: re.Match) -> str:
+    """'$1,000.00' -> '1000'; numbers keep their value, not their formatting."""
+    try:
+        value = Decimal(match.group(1).replace(",", ""))
+    except InvalidOperation:
+        return match.group(0)
+    return format(value.normalize(), "f")
+
+
+def normalize_query(query: str) -> str:
+    """Canonical text of a query: case, whitespace and number formatting folded."""
+    query = _WHITESPACE.sub(" ", query.lower()).strip()
+    return _NUMBER.sub(_fold_number, query)
+
+
+class ParsedQueryCache:
+    """
+    ParsedQuery results keyed by normalized query text and the category
+    vocabulary version (a renamed category can change a rule-based parse).
+    
+    Repeats are answered from the cache's in-process tier without a network
+    hop; Redis shares parses (including paid LLM ones) between workers.
+    """
+    
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+    
+    @staticmethod
+    def _key(query: str, vocabulary_version: int) -> str:
+        digest = hashlib.sha1(normalize_query(query).encode("utf-8")).hexdigest()
+        return f"{PARSED_QUERY_CACHE_PREFIX}{vocabulary_version}_{digest}"
+    
+    async def get(self, query: str, vocabulary_version: int = 0) -> Optional[ParsedQuery]:
+        data = await cache.get(self._key(query, vocabulary_version))
+        if data is None:
+            return None
+        return ParsedQuery(**{**data, "raw_query": query})
+    
+    async def set(self, query: str, parsed: ParsedQuery, vocabulary_version: int = 0) -> None:
+        key = self._key(query, vocabulary_version)
+        await cache.set(key, asdict(parsed), expire=self.ttl)
+    
+    def clear(self) -> None:
+        """Drop this worker's in-process copies."""
+        cache.local.delete_matching(f"{PARSED_QUERY_CACHE_PREFIX}*")
+
+
+class CircuitBreaker:
+    """
+    Stops calling a flaky dependency after repeated failures.
+    
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    (errors, timeouts or calls slower than `slow_call_seconds`) it opens and
+    rejects calls for `reset_seconds`, then lets a single trial call through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+    
+    def __init__(self, failure_threshold: int, reset_seconds: float, slow_call_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        """Whether a call may be attempted now."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+    
+    def release_trial(self) -> None:
+        """Give back a half-open trial slot that was not used."""
+        self._trial_running = False
+    
+    def record_success(self, latency: float) -> None:
+        if latency > self.slow_call_seconds:
+            self.record_failure()
+            return
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+    
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
 
 
 class InventoryQueryParser:
@@ -49,6 +192,12 @@ Respond with ONLY the JSON object, no markdown, no explanation."""
         self.ai_available = False
         self.client = None
         self._initialized = False
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.llm_breaker_failures,
+            reset_seconds=settings.llm_breaker_reset_seconds,
+            slow_call_seconds=settings.llm_slow_call_seconds,
+        )
+        self.cache = ParsedQueryCache(ttl=settings.parsed_query_cache_ttl)
     
     def _init_ai(self):
         """Initialize Gemini AI if API key is available (lazy)."""
@@ -73,37 +222,93 @@ Respond with ONLY the JSON object, no markdown, no explanation."""
         except Exception as e:
             print(f"⚠️ Failed to initialize Gemini: {e}")
     
-    async def parse(self, query: str) -> ParsedQuery:
-        """Parse natural language query into structured filters."""
+    async def parse(
+        self,
+        query: str,
+        allow_llm: Optional[Callable[[], bool]] = None,
+    ) -> ParsedQuery:
+        """
+        Parse natural language query into structured filters.
+        
+        The rule-based parser runs first; the LLM is only consulted when it
+        explains less than `llm_confidence_threshold` of the query, and only
+        if `allow_llm()` (e.g. a per-client LLM budget) agrees.
+        """
+        await category_vocabulary.refresh()
+        version = category_vocabulary.version
+        
+        # Repeat questions skip the parsers (and the LLM) entirely
+        cached = await self.cache.get(query, version)
+        if cached:
+            return cached
+        
+        # Parse the canonical text the cache key is derived from, so every
+        # spelling that shares a key ("$1,000", "1000") parses the same way
+        text = normalize_query(query)
+        result = self._parse_with_regex(text)
+        result.raw_query = query
+        if result.confidence >= settings.llm_confidence_threshold:
+            await self.cache.set(query, result, version)
+            return result
+        
         # Lazy initialization
         self._init_ai()
         
-        result = ParsedQuery(raw_query=query)
+        # Ask the LLM, unless the breaker has tripped or the budget is spent
+        if self.ai_available and self.breaker.allow():
+            if allow_llm is None or allow_llm():
+                try:
+                    ai_result = await self._parse_with_ai(text)
+                    if ai_result:
+                        ai_result.raw_query = query
+                        await self.cache.set(query, ai_result, version)
+                        self._log_ai_parse(query, ai_result)
+                        return ai_result
+                except Exception as e:
+                    print(f"AI parsing failed: {e}")
+            else:
+                # Budget refusal is not a failure; free a half-open trial slot
+                self.breaker.release_trial()
         
-        # Try AI first
-        if self.ai_available:
-            try:
-                ai_result = await self._parse_with_ai(query)
-                if ai_result:
-                    return ai_result
-            except Exception as e:
-                print(f"AI parsing failed: {e}")
-        
-        # Fallback to regex
-        return self._parse_with_regex(query)
+        # Low-confidence regex result. Only cached when AI is not configured,
+        # so a fallback during an LLM outage does not outlive the outage.
+        if not self.ai_available:
+            await self.cache.set(query, result, version)
+        return result
+    
+    def _log_ai_parse(self, query: str, parsed: ParsedQuery) -> None:
+        """Append an LLM parse to the training log (for a local classifier)."""
+        if not settings.llm_parse_log_path:
+            return
+        record = {"query": normalize_query(query), **asdict(parsed)}
+        record.pop("raw_query", None)
+        try:
+            with open(settings.llm_parse_log_path, "a", encoding="utf-8") as log:
+                log.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not log AI parse: {e}")
     
     async def _parse_with_ai(self, query: str) -> Optional[ParsedQuery]:
-        """Use Gemini to parse the query."""
+        """
+        Use Gemini to parse the query.
+        
+        Goes through the async client so the event loop keeps serving other
+        requests, with a hard timeout. Outcomes feed the circuit breaker.
+        """
         if not self.client:
             return None
         
+        started = time.monotonic()
         try:
             prompt = f"{self.SYSTEM_PROMPT}\n\nUser query: {query}"
             
-            # Use the new google-genai API
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=prompt,
+            # Use the new google-genai async API
+            response = await asyncio.wait_for(
+                self.client.aio.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=prompt,
+                ),
+                timeout=settings.llm_timeout_seconds,
             )
             
             # Extract JSON from response
@@ -115,6 +320,7 @@ Respond with ONLY the JSON object, no markdown, no explanation."""
                 text = text.replace("```", "")
             
             parsed = json.loads(text.strip())
+            self.breaker.record_success(time.monotonic() - started)
             
             return ParsedQuery(
                 name_contains=parsed.get("name_contains"),
@@ -127,61 +333,97 @@ Respond with ONLY the JSON object, no markdown, no explanation."""
                 raw_query=query,
                 parse_method="ai",
             )
+        except asyncio.TimeoutError:
+            print(f"AI parsing timed out after {settings.llm_timeout_seconds}s")
+            self.breaker.record_failure()
+            return None
+        except asyncio.CancelledError:
+            # Request went away mid-call: says nothing about the LLM's health,
+            # so free a half-open trial slot without recording a failure
+            self.breaker.release_trial()
+            raise
         except json.JSONDecodeError as e:
             print(f"AI returned invalid JSON: {e}")
+            self.breaker.record_failure()
             return None
         except Exception as e:
             print(f"AI parsing error: {e}")
+            self.breaker.record_failure()
             return None
     
+    # Words that carry no filter meaning (explained, never used as names)
+    STOPWORDS = frozenset({
+        "show", "me", "find", "get", "list", "all", "the", "a", "an", "in", "with",
+        "that", "are", "is", "items", "products", "product", "things", "stuff",
+    })
+    SORT_ASC = frozenset({"cheap", "cheaper", "cheapest"})
+    SORT_DESC = frozenset({"expensive", "pricey"})
+    # Filter words that are never part of a product name, even when stray
+    KEYWORDS = frozenset({"low", "stock", "under", "over"}) | SORT_ASC | SORT_DESC
+    
+    # One pass over the query: price bounds, stock phrases, then single words
+    TOKEN_PATTERN = re.compile(
+        r"(?P<bound>under|over)\s*\$?(?P<amount>\d+(?:\.\d+)?)\b"
+        r"|(?P<stock>(?:low|out\s+of)\s+stock)\b"
+        r"|(?P<word>\S+)"
+    )
+    
     def _parse_with_regex(self, query: str) -> ParsedQuery:
-        """Fallback regex-based parsing for common patterns."""
-        query_lower = query.lower()
+        """
+        Rule-based parsing for common patterns.
+        
+        Sets `confidence` to the share of query words the rules explained;
+        words only guessed to be part of a product name count half.
+        """
         result = ParsedQuery(raw_query=query, parse_method="regex")
+        explained_count = 0
+        words: list[str] = []  # Words no phrase consumed, for category/name matching
+        
+        for match in self.TOKEN_PATTERN.finditer(query.lower()):
+            if match.group("bound"):
+                amount = float(match.group("amount"))
+                if match.group("bound") == "under":
+                    result.max_price = amount
+                else:
+                    result.min_price = amount
+                explained_count += len(match.group().split())
+            elif match.group("stock"):
+                result.low_stock = True
+                explained_count += len(match.group().split())
+            else:
+                words.extend(split_words(match.group()))
+        
+        explained = [False] * len(words)
+        for i, word in enumerate(words):
+            if word in self.SORT_ASC or word in self.SORT_DESC:
+                if result.sort_by is None:
+                    result.sort_by = "price"
+                    result.sort_order = "asc" if word in self.SORT_ASC else "desc"
+                explained[i] = True
+            elif word in self.STOPWORDS:
+                explained[i] = True
+        
+        # Category mention (from the categories table)
+        category = category_vocabulary.match(words)
+        if category:
+            start, end, result.category_contains = category
+            explained[start:end] = [True] * (end - start)
         
-        # Low stock detection
-        if "low stock" in query_lower or "out of stock" in query_lower:
-            result.low_stock = True
-        
-        # Price sorting
-        if "cheap" in query_lower or "cheapest" in query_lower:
-            result.sort_by = "price"
-            result.sort_order = "asc"
-        elif "expensive" in query_lower or "pricey" in query_lower:
-            result.sort_by = "price"
-            result.sort_order = "desc"
-        
-        # Price filters
-        price_under = re.search(r"under\s*\$?(\d+(?:\.\d{2})?)", query_lower)
-        if price_under:
-            result.max_price = float(price_under.group(1))
-        
-        price_over = re.search(r"over\s*\$?(\d+(?:\.\d{2})?)", query_lower)
-        if price_over:
-            result.min_price = float(price_over.group(1))
-        
-        # Category keywords
-        categories = ["electronics", "clothing", "food", "furniture", "toys", "books", "sports", "health"]
-        for cat in categories:
-            if cat in query_lower:
-                result.category_contains = cat
-                break
-        
-        # Name search (remaining significant words)
-        # Remove common words and extract potential product names
-        stopwords = {"show", "me", "find", "get", "list", "all", "the", "a", "an", "in", "with", "that", "are", "is"}
-        words = query_lower.split()
-        meaningful_words = [w for w in words if w not in stopwords and len(w) > 2 and not w.startswith("$")]
-        
-        # If no category found and we have meaningful words, use as name search
-        if not result.category_contains and meaningful_words:
-            # Filter out already-used keywords
-            used_keywords = {"cheap", "expensive", "low", "stock", "under", "over", "pricey", "cheapest"}
-            used_keywords.update(categories)
-            remaining = [w for w in meaningful_words if w not in used_keywords]
-            if remaining:
-                result.name_contains = " ".join(remaining[:3])  # Max 3 words
+        # Name search (remaining significant words, max 3) when no category
+        guessed = 0
+        if not result.category_contains:
+            name_words = [
+                w for i, w in enumerate(words)
+                if not explained[i] and len(w) > 2
+                and not w.startswith("$") and w not in self.KEYWORDS
+            ][:3]
+            if name_words:
+                result.name_contains = " ".join(name_words)
+                guessed = len(name_words)
         
+        total = explained_count + len(words)
+        explained_count += sum(explained)
+        result.confidence = (explained_count + 0.5 * guessed) / total if total else 0.0
         return result
 
 
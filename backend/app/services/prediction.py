@@ -1,11 +1,17 @@
 """Prediction engine for inventory forecasting."""
+import asyncio
+import time
+from fnmatch import fnmatchcase
 from datetime import datetime, timedelta, timezone
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import cache
+from app.database import run_after_commit
+from app.models.category import Category
 from app.models.product import Product
-from app.models.sales_order import SalesOrder
+from app.models.sales_daily import SalesDaily
 
 
 @dataclass
@@ -22,6 +28,20 @@ class ProductForecast:
     category_name: str | None
 
 
+# Forecast snapshots are cached for this long (seconds)
+FORECAST_CACHE_TTL = 300
+FORECAST_CACHE_PREFIX = "forecast_snapshot_"
+
+# In-process fallback used while Redis is unavailable: key -> (expires_at, forecasts)
+_local_snapshots: dict[str, tuple[float, list[ProductForecast]]] = {}
+
+# One in-flight computation per key; concurrent misses wait for it
+_snapshot_locks: dict[str, asyncio.Lock] = {}
+
+# Bumped on every invalidation so a computation that started before it is not stored
+_generation = 0
+
+
 async def calculate_forecasts(
     db: AsyncSession,
     lookback_days: int = 30,
@@ -29,6 +49,9 @@ async def calculate_forecasts(
 ) -> list[ProductForecast]:
     """
     Calculate stock forecasts for all products.
+
+    Sales velocity for the whole catalog is fetched with one grouped
+    aggregate, so the number of queries does not grow with product count.
     
     Args:
         db: Database session
@@ -38,61 +61,179 @@ async def calculate_forecasts(
     Returns:
         List of ProductForecast sorted by urgency (critical first)
     """
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=lookback_days)
+    # Window of `lookback_days` calendar days (UTC), today included
+    cutoff_day = datetime.now(timezone.utc).date() - timedelta(days=lookback_days)
 
-    # Get all products with their sales data
-    products_result = await db.execute(select(Product))
-    products = products_result.scalars().all()
+    # Total sales per product in the lookback period, read from the daily
+    # rollup so cost scales with days rather than with individual orders
+    sales_subq = (
+        select(
+            SalesDaily.product_id,
+            func.sum(SalesDaily.units).label("total_sold"),
+        )
+        .where(SalesDaily.day > cutoff_day)
+        .group_by(SalesDaily.product_id)
+        .subquery()
+    )
 
-    forecasts: list[ProductForecast] = []
+    # Single statement: every product LEFT JOINed to its sales sum and category
+    result = await db.execute(
+        select(
+            Product.id,
+            Product.sku,
+            Product.name,
+            Product.quantity,
+            Category.name,
+            func.coalesce(sales_subq.c.total_sold, 0),
+        )
+        .outerjoin(sales_subq, Product.id == sales_subq.c.product_id)
+        .outerjoin(Category, Product.category_id == Category.id)
+    )
 
-    for product in products:
-        # Calculate total sales in the lookback period
-        sales_result = await db.execute(
-            select(func.sum(SalesOrder.quantity_sold))
-            .where(SalesOrder.product_id == product.id)
-            .where(SalesOrder.sold_at >= cutoff_date)
+    forecasts = [
+        _build_forecast(
+            product_id=row[0],
+            sku=row[1],
+            name=row[2],
+            quantity=row[3],
+            category_name=row[4],
+            total_sold=row[5] or 0,
+            lookback_days=lookback_days,
+            target_days_stock=target_days_stock,
         )
-        total_sold = sales_result.scalar() or 0
-
-        # Calculate average daily sales (velocity)
-        avg_daily_sales = total_sold / lookback_days if lookback_days > 0 else 0
-
-        # Calculate days until stockout
-        if avg_daily_sales > 0:
-            days_until_stockout = product.quantity / avg_daily_sales
-        else:
-            days_until_stockout = None  # Infinite (no sales)
-
-        # Calculate suggested reorder quantity
-        # Formula: (TargetDays * Velocity) - CurrentStock
-        target_stock = target_days_stock * avg_daily_sales
-        suggested_reorder = max(0, int(target_stock - product.quantity))
-
-        # Determine urgency
-        if days_until_stockout is None:
-            urgency = "ok"  # No sales, not urgent
-        elif days_until_stockout <= 3:
-            urgency = "critical"
-        elif days_until_stockout <= 7:
-            urgency = "warning"
-        else:
-            urgency = "ok"
-
-        forecasts.append(ProductForecast(
-            product_id=product.id,
-            sku=product.sku,
-            name=product.name,
-            current_quantity=product.quantity,
-            avg_daily_sales=round(avg_daily_sales, 2),
-            days_until_stockout=round(days_until_stockout, 1) if days_until_stockout else None,
-            suggested_reorder=suggested_reorder,
-            urgency=urgency,
-            category_name=product.category.name if product.category else None,
-        ))
+        for row in result.all()
+    ]
 
     # Sort by urgency (critical first, then warning, then ok)
     urgency_order = {"critical": 0, "warning": 1, "ok": 2}
     forecasts.sort(key=lambda f: (urgency_order[f.urgency], f.days_until_stockout or 9999))
 
     return forecasts
+
+
+def _build_forecast(
+    product_id: int,
+    sku: str,
+    name: str,
+    quantity: int,
+    category_name: str | None,
+    total_sold: int,
+    lookback_days: int,
+    target_days_stock: int,
+) -> ProductForecast:
+    """Derive velocity, stockout days, reorder quantity and urgency for one product."""
+    # Calculate average daily sales (velocity)
+    avg_daily_sales = total_sold / lookback_days if lookback_days > 0 else 0
+
+    # Calculate days until stockout
+    if avg_daily_sales > 0:
+        days_until_stockout = quantity / avg_daily_sales
+    else:
+        days_until_stockout = None  # Infinite (no sales)
+
+    # Calculate suggested reorder quantity
+    # Formula: (TargetDays * Velocity) - CurrentStock
+    target_stock = target_days_stock * avg_daily_sales
+    suggested_reorder = max(0, int(target_stock - quantity))
+
+    # Determine urgency
+    if days_until_stockout is None:
+        urgency = "ok"  # No sales, not urgent
+    elif days_until_stockout <= 3:
+        urgency = "critical"
+    elif days_until_stockout <= 7:
+        urgency = "warning"
+    else:
+        urgency = "ok"
+
+    return ProductForecast(
+        product_id=product_id,
+        sku=sku,
+        name=name,
+        current_quantity=quantity,
+        avg_daily_sales=round(avg_daily_sales, 2),
+        days_until_stockout=round(days_until_stockout, 1) if days_until_stockout else None,
+        suggested_reorder=suggested_reorder,
+        urgency=urgency,
+        category_name=category_name,
+    )
+
+
+async def get_cached_forecasts(
+    db: AsyncSession,
+    lookback_days: int = 30,
+    target_days_stock: int = 14,
+) -> list[ProductForecast]:
+    """
+    Return the forecast snapshot for the given parameters, computing it at
+    most once per TTL.
+
+    Snapshots live in Redis when it is connected and in process memory
+    otherwise. Callers must not mutate the returned list.
+    """
+    key = f"{FORECAST_CACHE_PREFIX}{lookback_days}_{target_days_stock}"
+
+    cached = await _read_snapshot(key)
+    if cached is not None:
+        return cached
+
+    lock = _snapshot_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        # Another request may have filled the snapshot while we waited
+        cached = await _read_snapshot(key)
+        if cached is not None:
+            return cached
+
+        generation = _generation
+        forecasts = await calculate_forecasts(db, lookback_days, target_days_stock)
+
+        if generation == _generation:
+            if cache.redis:
+                await cache.set(key, [asdict(f) for f in forecasts], expire=FORECAST_CACHE_TTL)
+            else:
+                _local_snapshots[key] = (time.monotonic() + FORECAST_CACHE_TTL, forecasts)
+
+    return forecasts
+
+
+async def _read_snapshot(key: str) -> list[ProductForecast] | None:
+    """Return a cached snapshot from Redis or process memory, if present."""
+    if cache.redis:
+        cached = await cache.get(key)
+        if cached is not None:
+            return [ProductForecast(**item) for item in cached]
+        return None
+
+    local = _local_snapshots.get(key)
+    if local and local[0] > time.monotonic():
+        return local[1]
+    return None
+
+
+def _drop_local_snapshots(pattern: str) -> None:
+    """Local invalidator: runs for this worker's and other workers' invalidations."""
+    global _generation
+    if not fnmatchcase(FORECAST_CACHE_PREFIX, pattern) and not pattern.startswith(FORECAST_CACHE_PREFIX):
+        return
+    # A computation started before the invalidation must not be stored
+    _generation += 1
+    for key in [key for key in _local_snapshots if fnmatchcase(key, pattern)]:
+        del _local_snapshots[key]
+
+
+cache.add_local_invalidator(_drop_local_snapshots)
+
+
+async def invalidate_forecast_cache() -> None:
+    """Drop all forecast snapshots, in every worker."""
+    await cache.delete_pattern(f"{FORECAST_CACHE_PREFIX}*")
+
+
+def invalidate_forecasts_on_commit(db: AsyncSession) -> None:
+    """
+    Drop forecast snapshots once the session's transaction commits.
+
+    Invalidating before the commit would let a concurrent read recompute
+    from pre-commit data and cache it for the full TTL.
+    """
+    run_after_commit(db, invalidate_forecast_cache)
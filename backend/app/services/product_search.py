@@ -0,0 +1,192 @@
+"""Indexed substring search over product name and SKU.
+
+`ILIKE '%term%'` cannot use a btree index, so every search scans the whole
+products table. The backends here keep a substring-capable index instead:
+
+- PostgreSQL: pg_trgm GIN indexes on name and sku, which serve ILIKE directly
+  and provide similarity() for ranking.
+- SQLite: an FTS5 shadow table with the trigram tokenizer, kept in sync with
+  products by triggers and ranked with bm25.
+
+Anything else (or a SQLite build without FTS5 trigram support) falls back to
+plain ILIKE.
+"""
+from sqlalchemy import Select, column, func, literal_column, or_, select, table, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.models.product import Product
+
+# Trigram indexes cannot match terms shorter than this
+MIN_INDEXED_TERM = 3
+
+
+class SearchBackend:
+    """Plain ILIKE search (no index support)."""
+
+    name = "ilike"
+
+    async def setup(self, conn: AsyncConnection) -> bool:
+        """Create index structures. Returns False if unsupported here."""
+        return True
+
+    def _ilike(self, term: str):
+        return or_(
+            Product.name.ilike(f"%{term}%"),
+            Product.sku.ilike(f"%{term}%"),
+        )
+
+    def filter(self, query: Select, term: str) -> Select:
+        """Restrict `query` to products whose name or SKU contains `term`."""
+        return query.where(self._ilike(term))
+
+    def filter_name(self, query: Select, term: str) -> Select:
+        """Restrict `query` to products whose name contains `term`."""
+        return query.where(Product.name.ilike(f"%{term}%"))
+
+    def ranked(self, query: Select, term: str) -> Select:
+        """Filter like `filter` and order the best matches first."""
+        # Prefix matches on SKU/name are the most relevant without an index
+        return self.filter(query, term).order_by(
+            Product.sku.ilike(f"{term}%").desc(),
+            Product.name.ilike(f"{term}%").desc(),
+            Product.name,
+        )
+
+
+class PostgresTrigramBackend(SearchBackend):
+    """pg_trgm GIN indexes; ILIKE is served by the index, ranked by similarity."""
+
+    name = "pg_trgm"
+
+    async def setup(self, conn: AsyncConnection) -> bool:
+        try:
+            # Savepoint so a missing privilege does not abort the outer transaction
+            async with conn.begin_nested():
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm "
+                    "ON products USING gin (name gin_trgm_ops)"
+                ))
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_products_sku_trgm "
+                    "ON products USING gin (sku gin_trgm_ops)"
+                ))
+        except Exception as e:
+            print(f"⚠️ pg_trgm search unavailable, using ILIKE: {e}")
+            return False
+        return True
+
+    def ranked(self, query: Select, term: str) -> Select:
+        score = func.greatest(
+            func.similarity(Product.name, term),
+            func.similarity(Product.sku, term),
+        )
+        return self.filter(query, term).order_by(score.desc(), Product.name)
+
+
+# FTS5 shadow table over products(name, sku); rowid is products.id
+_fts = table("products_fts", column("rowid"), column("rank"))
+
+
+class SqliteFts5Backend(SearchBackend):
+    """FTS5 trigram shadow table kept in sync with products by triggers."""
+
+    name = "fts5"
+
+    _TRIGGERS = (
+        """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, sku)
+            VALUES ('delete', old.id, old.name, old.sku);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, sku)
+            VALUES ('delete', old.id, old.name, old.sku);
+            INSERT INTO products_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku);
+        END""",
+    )
+
+    async def setup(self, conn: AsyncConnection) -> bool:
+        exists = await conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        ))
+        created = exists.first() is None
+        if created:
+            try:
+                await conn.execute(text(
+                    "CREATE VIRTUAL TABLE products_fts USING fts5("
+                    "name, sku, content='products', content_rowid='id', tokenize='trigram')"
+                ))
+            except Exception as e:
+                print(f"⚠️ FTS5 trigram search unavailable, using ILIKE: {e}")
+                return False
+
+        for trigger in self._TRIGGERS:
+            await conn.execute(text(trigger))
+
+        if created:
+            # Index rows that existed before the shadow table
+            await conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+        return True
+
+    @staticmethod
+    def _match(term: str) -> str:
+        """Quote the term as an FTS5 phrase (substring match under trigram)."""
+        return '"' + term.replace('"', '""') + '"'
+
+    @staticmethod
+    def _matches(expression: str):
+        return literal_column("products_fts").op("MATCH")(expression)
+
+    def filter(self, query: Select, term: str) -> Select:
+        if len(term) < MIN_INDEXED_TERM:
+            return super().filter(query, term)
+        return query.where(Product.id.in_(
+            select(_fts.c.rowid).where(self._matches(self._match(term)))
+        ))
+
+    def filter_name(self, query: Select, term: str) -> Select:
+        if len(term) < MIN_INDEXED_TERM:
+            return super().filter_name(query, term)
+        # FTS5 column filter: name : "term"
+        return query.where(Product.id.in_(
+            select(_fts.c.rowid).where(self._matches(f"name : {self._match(term)}"))
+        ))
+
+    def ranked(self, query: Select, term: str) -> Select:
+        if len(term) < MIN_INDEXED_TERM:
+            return super().ranked(query, term)
+        matches = (
+            select(_fts.c.rowid, _fts.c.rank)
+            .where(self._matches(self._match(term)))
+            .subquery()
+        )
+        return (
+            query.join(matches, Product.id == matches.c.rowid)
+            .order_by(matches.c.rank, Product.name)
+        )
+
+
+# Active backend for this process, chosen by setup_search_backend()
+_backend: SearchBackend = SearchBackend()
+
+
+def get_search_backend() -> SearchBackend:
+    """Return the search backend in use."""
+    return _backend
+
+
+async def setup_search_backend(conn: AsyncConnection) -> SearchBackend:
+    """Pick the backend for this database and create its index structures."""
+    global _backend
+
+    candidates = {
+        "postgresql": PostgresTrigramBackend,
+        "sqlite": SqliteFts5Backend,
+    }
+    backend_class = candidates.get(conn.dialect.name, SearchBackend)
+    backend = backend_class()
+    _backend = backend if await backend.setup(conn) else SearchBackend()
+    return _backend
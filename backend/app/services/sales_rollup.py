@@ -0,0 +1,203 @@
+"""Daily sales rollup maintenance: recording, backfill and compaction."""
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import Date, cast, delete, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import async_session_maker, upsert_insert
+from app.models.sales_daily import SalesDaily
+from app.models.sales_order import SalesOrder
+from app.services.prediction import invalidate_forecasts_on_commit
+
+settings = get_settings()
+
+# Rows per multi-VALUES upsert (keeps well under SQLite's bound-parameter limit)
+_UPSERT_CHUNK = 500
+
+
+def _sale_day(db: AsyncSession):
+    """SQL expression for the UTC calendar day of SalesOrder.sold_at."""
+    if db.bind.dialect.name == "postgresql":
+        return cast(func.timezone("UTC", SalesOrder.sold_at), Date)
+    return func.date(SalesOrder.sold_at)
+
+
+def _utc_day(moment: datetime) -> date:
+    """Calendar day of a timestamp in UTC (naive values are treated as UTC)."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    return moment.date()
+
+
+async def record_sales(
+    db: AsyncSession,
+    sales: list[tuple[int, int, datetime]],
+) -> int:
+    """
+    Record sales orders and add them to the daily rollup.
+
+    Args:
+        db: Database session
+        sales: (product_id, quantity_sold, sold_at) tuples
+
+    Returns:
+        Number of sales orders written
+    """
+    if not sales:
+        return 0
+
+    totals: dict[tuple[int, date], list[int]] = defaultdict(lambda: [0, 0])
+    for product_id, quantity_sold, sold_at in sales:
+        db.add(SalesOrder(
+            product_id=product_id,
+            quantity_sold=quantity_sold,
+            sold_at=sold_at,
+        ))
+        bucket = totals[(product_id, _utc_day(sold_at))]
+        bucket[0] += quantity_sold
+        bucket[1] += 1
+
+    await db.flush()
+
+    rows = [
+        {"product_id": product_id, "day": day, "units": units, "order_count": count}
+        for (product_id, day), (units, count) in totals.items()
+    ]
+    for start in range(0, len(rows), _UPSERT_CHUNK):
+        stmt = upsert_insert(db, SalesDaily).values(rows[start:start + _UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SalesDaily.product_id, SalesDaily.day],
+            set_={
+                "units": SalesDaily.units + stmt.excluded.units,
+                "order_count": SalesDaily.order_count + stmt.excluded.order_count,
+            },
+        )
+        await db.execute(stmt)
+
+    invalidate_forecasts_on_commit(db)
+    return len(sales)
+
+
+async def record_sale(
+    db: AsyncSession,
+    product_id: int,
+    quantity_sold: int = 1,
+    sold_at: datetime | None = None,
+) -> None:
+    """Record a single sale and update the rollup."""
+    await record_sales(db, [(product_id, quantity_sold, sold_at or datetime.now(timezone.utc))])
+
+
+async def _fold_raw_orders(db: AsyncSession) -> None:
+    """
+    Add totals computed from raw sales orders to the rollup rows.
+
+    Like record_sales, conflicting rows are incremented rather than
+    overwritten, so units already in the rollup (including those of orders
+    compacted away) are kept.
+    """
+    day = _sale_day(db)
+    source = (
+        select(
+            SalesOrder.product_id,
+            day,
+            func.sum(SalesOrder.quantity_sold),
+            func.count(SalesOrder.id),
+        )
+        # SQLite needs a WHERE clause to parse INSERT ... SELECT ... ON CONFLICT
+        .where(true())
+        .group_by(SalesOrder.product_id, day)
+    )
+
+    stmt = upsert_insert(db, SalesDaily).from_select(
+        ["product_id", "day", "units", "order_count"],
+        source,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SalesDaily.product_id, SalesDaily.day],
+        set_={
+            "units": SalesDaily.units + stmt.excluded.units,
+            "order_count": SalesDaily.order_count + stmt.excluded.order_count,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def backfill_sales_rollup(db: AsyncSession) -> bool:
+    """
+    Build the rollup from raw sales orders if it is still empty.
+
+    Orders written through record_sales are rolled up as they are recorded,
+    so only rows predating the rollup need folding; once any rollup row
+    exists this is a no-op (folding again would double count).
+
+    Returns:
+        Whether the rollup was backfilled
+    """
+    existing = await db.execute(select(SalesDaily.product_id).limit(1))
+    if existing.first() is not None:
+        return False
+
+    await _fold_raw_orders(db)
+    await db.flush()
+    invalidate_forecasts_on_commit(db)
+    return True
+
+
+async def compact_sales_orders(
+    db: AsyncSession,
+    retention_days: int | None = None,
+) -> int:
+    """
+    Delete raw sales orders older than the retention window.
+
+    Their units are already in the rollup (record_sales maintains it on
+    every write), so nothing is folded here. The cutoff is aligned to
+    midnight UTC so that every day left in `sales_orders` is complete.
+
+    Returns:
+        Number of raw sales orders deleted
+    """
+    if retention_days is None:
+        retention_days = settings.sales_retention_days
+
+    cutoff_day = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+    cutoff = datetime.combine(cutoff_day, time.min, tzinfo=timezone.utc)
+
+    result = await db.execute(
+        delete(SalesOrder).where(SalesOrder.sold_at < cutoff)
+    )
+    await db.flush()
+
+    return result.rowcount or 0
+
+
+async def sync_sales_rollup(db: AsyncSession) -> None:
+    """Backfill an empty rollup from raw orders, then compact old rows."""
+    await backfill_sales_rollup(db)
+
+    deleted = await compact_sales_orders(db)
+    if deleted:
+        print(f"📦 Compacted {deleted} sales orders into daily rollup.")
+
+
+async def run_compaction_loop(interval_seconds: int | None = None) -> None:
+    """
+    Periodically compact old sales orders so the raw table stays bounded in
+    long-running processes. Runs until cancelled.
+    """
+    if interval_seconds is None:
+        interval_seconds = settings.sales_compaction_interval_seconds
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with async_session_maker() as session:
+                deleted = await compact_sales_orders(session)
+                await session.commit()
+            if deleted:
+                print(f"📦 Compacted {deleted} sales orders into daily rollup.")
+        except Exception as e:
+            print(f"Sales compaction error: {e}")
@@ -0,0 +1,57 @@
+"""Smart-search result cache.
+
+Result sets are keyed by the canonical form of the parsed filters, so
+"cheap phones" and "phones, cheapest first" share one entry, plus the
+catalog version (see app.services.catalog). Every product and category
+write bumps that version after commit, which moves all readers to new keys:
+nothing stale is served, and old entries simply age out. Entries are served
+from the cache's in-process tier when possible.
+"""
+import hashlib
+
+from app.config import get_settings
+from app.core.cache import cache
+from app.schemas.product import ProductResponse
+from app.services.catalog import get_catalog_version
+from app.services.llm_search import ParsedQuery
+
+settings = get_settings()
+
+SMART_SEARCH_CACHE_PREFIX = "smart_search_"
+
+
+class SearchResultCache:
+    """Smart-search results in Redis and the cache's in-process tier."""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(parsed: ParsedQuery, version: int) -> str:
+        digest = hashlib.sha1(parsed.canonical_key().encode("utf-8")).hexdigest()
+        return f"{SMART_SEARCH_CACHE_PREFIX}{version}_{digest}"
+
+    async def key_for(self, parsed: ParsedQuery) -> str:
+        """Cache key for `parsed` at the current catalog version."""
+        return self._key(parsed, await get_catalog_version())
+
+    async def get(self, key: str) -> list[ProductResponse] | None:
+        data = await cache.get(key)
+        if data is None:
+            return None
+        return [ProductResponse.model_validate(item) for item in data]
+
+    async def set(self, key: str, results: list[ProductResponse]) -> None:
+        await cache.set(
+            key,
+            [item.model_dump(mode="json") for item in results],
+            expire=self.ttl,
+        )
+
+    def clear(self) -> None:
+        """Drop this worker's in-process copies."""
+        cache.local.delete_matching(f"{SMART_SEARCH_CACHE_PREFIX}*")
+
+
+# Singleton instance
+search_result_cache = SearchResultCache(ttl=settings.smart_search_cache_ttl)
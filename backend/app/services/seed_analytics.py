@@ -5,7 +5,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.product import Product
+from app.models.sales_daily import SalesDaily
 from app.models.sales_order import SalesOrder
+from app.services.sales_rollup import record_sales
 
 
 async def seed_sales_history(db: AsyncSession) -> int:
@@ -13,9 +15,11 @@ async def seed_sales_history(db: AsyncSession) -> int:
     Generate dummy sales history for all products over the last 30 days.
     Returns the number of sales orders created.
     """
-    # Check if we already have sales data
-    existing = await db.execute(select(SalesOrder).limit(1))
-    if existing.scalar_one_or_none():
+    # Check if we already have sales data (raw rows may have been compacted
+    # into the rollup, so look at both tables)
+    existing = await db.execute(select(SalesOrder.id).limit(1))
+    rolled_up = await db.execute(select(SalesDaily.product_id).limit(1))
+    if existing.first() is not None or rolled_up.first() is not None:
         print("📊 Sales history already exists, skipping seed.")
         return 0
 
@@ -28,7 +32,7 @@ async def seed_sales_history(db: AsyncSession) -> int:
         return 0
 
     now = datetime.now(timezone.utc)
-    sales_created = 0
+    sales: list[tuple[int, int, datetime]] = []
 
     for product in products:
         # Assign a random "velocity category" to each product
@@ -53,14 +57,9 @@ async def seed_sales_history(db: AsyncSession) -> int:
                 random_minutes = random.randint(0, 59)
                 sale_time = sale_date.replace(hour=random_hours, minute=random_minutes)
 
-                order = SalesOrder(
-                    product_id=product.id,
-                    quantity_sold=random.randint(1, 3),
-                    sold_at=sale_time,
-                )
-                db.add(order)
-                sales_created += 1
+                sales.append((product.id, random.randint(1, 3), sale_time))
 
-    await db.flush()
+    # Writes raw orders and the matching daily rollup rows
+    sales_created = await record_sales(db, sales)
     print(f"✅ Seeded {sales_created} sales orders for {len(products)} products.")
     return sales_created
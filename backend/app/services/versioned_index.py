@@ -0,0 +1,60 @@
+"""Base class for per-worker in-memory indexes over catalog data.
+
+Each worker builds its own copy from the database and compares a shared
+version counter (see app.services.catalog) with the version it was built
+from, so writes made by other workers are noticed within
+VERSION_CHECK_INTERVAL seconds. Rebuilds run in the background; nothing is
+built until warm() has been called once (at startup).
+"""
+import asyncio
+import time
+
+# How often (seconds) a worker checks the shared version
+VERSION_CHECK_INTERVAL = 1.0
+
+
+class VersionedIndex:
+    """In-memory structure rebuilt when a shared version counter moves."""
+
+    # Names the index in log messages
+    label = "Index"
+
+    def __init__(self, version: int | None = None) -> None:
+        self._version = version
+        self._last_check = 0.0
+        self._rebuild_task: asyncio.Task | None = None
+        self._active = False  # set by warm(); rebuilds only happen once active
+
+    async def current_version(self) -> int:
+        """Shared version the index follows."""
+        raise NotImplementedError
+
+    async def build(self) -> None:
+        """Load from the database; must set `_version` to the version read first."""
+        raise NotImplementedError
+
+    def warm(self) -> None:
+        """Start a background (re)build unless one is already running."""
+        self._active = True
+        if self._rebuild_task and not self._rebuild_task.done():
+            return
+        self._rebuild_task = asyncio.create_task(self._safe_build())
+
+    async def _safe_build(self) -> None:
+        try:
+            await self.build()
+        except Exception as e:
+            print(f"{self.label} build error: {e}")
+
+    async def version_moved(self) -> bool:
+        """
+        Whether another worker changed the data since our build.
+
+        The shared version is read at most every VERSION_CHECK_INTERVAL
+        seconds; in between this returns False.
+        """
+        now = time.monotonic()
+        if now - self._last_check < VERSION_CHECK_INTERVAL:
+            return False
+        self._last_check = now
+        return await self.current_version() != self._version
@@ -0,0 +1,123 @@
+"""Benchmark: CSV product import throughput.
+
+Compares the importers in app.services.product_import (chunked bulk upserts,
+and COPY into a staging table on PostgreSQL) with the previous row-by-row
+approach (one SELECT per row plus ORM add/setattr). The "resend" pass
+re-imports an identical file, which the hash check turns into a no-op. Rows
+use run-specific SKUs and are left in place, so point --database-url only at
+a scratch database.
+
+Usage (from backend/):
+    python -m benchmarks.import_csv --rows 20000
+    python -m benchmarks.import_csv --rows 20000 --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.database import Base
+from app.models.product import Product
+from app.services.product_import import (
+    COPY_CHUNK_SIZE,
+    IMPORT_CHUNK_SIZE,
+    copy_import,
+    iter_row_batches,
+    shutdown_parse_pool,
+    upsert_chunk,
+)
+import app.models  # noqa: F401  (register tables on Base.metadata)
+
+
+def make_csv(rows: int, prefix: str, variant: int = 0) -> str:
+    """Generate an import file with `rows` distinct SKUs (quantities vary by variant)."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([
+        "SKU", "Name", "Description", "Category ID",
+        "Quantity", "Unit Price", "Low Stock Threshold"
+    ])
+    for i in range(rows):
+        writer.writerow([f"{prefix}-{i:07d}", f"Bench product {i}", "", "", (i + variant) % 500, "9.99", 10])
+    return output.getvalue()
+
+
+async def row_by_row(db: AsyncSession, text: str) -> None:
+    """The previous importer: one SELECT and one ORM change per row."""
+    async for batch in iter_row_batches(io.StringIO(text), [], IMPORT_CHUNK_SIZE):
+        for _, values in batch:
+            existing = await db.execute(select(Product).where(Product.sku == values["sku"]))
+            product = existing.scalar_one_or_none()
+            if product:
+                for name, value in values.items():
+                    setattr(product, name, value)
+            else:
+                db.add(Product(**values))
+    await db.flush()
+
+
+async def batched(db: AsyncSession, text: str) -> None:
+    """One IN lookup and one multi-row upsert per chunk."""
+    async for batch in iter_row_batches(io.StringIO(text), [], IMPORT_CHUNK_SIZE):
+        await upsert_chunk(db, [values for _, values in batch], created_by=None)
+
+
+async def copy(db: AsyncSession, text: str) -> None:
+    """COPY into a staging table and merge once (PostgreSQL only)."""
+    batches = iter_row_batches(io.StringIO(text), [], COPY_CHUNK_SIZE)
+    await copy_import(db, batches, created_by=None)
+
+
+async def run(database_url: str, rows: int) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    run_id = int(time.time())
+    print(f"{'importer':<12} {'pass':<8} {'rows':>8} {'seconds':>9} {'rows/s':>10}")
+    importers = [("row-by-row", row_by_row), ("batched", batched)]
+    if engine.dialect.name == "postgresql":
+        importers.append(("copy", copy))
+
+    for name, importer in importers:
+        prefix = f"BENCH-{name.upper()}-{run_id}"
+        # Create every row, change every row, then re-send the same file
+        passes = (
+            ("create", make_csv(rows, prefix)),
+            ("update", make_csv(rows, prefix, variant=1)),
+            ("resend", make_csv(rows, prefix, variant=1)),
+        )
+        for label, text in passes:
+            async with session_maker() as session:
+                start = time.perf_counter()
+                await importer(session, text)
+                await session.commit()
+                elapsed = time.perf_counter() - start
+            print(f"{name:<12} {label:<8} {rows:>8} {elapsed:>9.2f} {rows / elapsed:>10.0f}")
+
+    await engine.dispose()
+    shutdown_parse_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--database-url", default=None, help="Defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    if args.database_url:
+        asyncio.run(run(args.database_url, args.rows))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", args.rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: rule-based smart-search parsing vs. category vocabulary size.
+
+Times InventoryQueryParser._parse_with_regex with vocabularies of increasing
+size (multi-word category names), next to the previous approach of one
+substring check per category. The automaton's per-query cost should stay
+flat; the substring loop grows with the vocabulary.
+
+Usage (from backend/):
+    python -m benchmarks.query_parser --queries 20000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("TESTING", "1")  # no Gemini client, no Redis
+
+from app.services.category_vocabulary import category_vocabulary  # noqa: E402
+from app.services.llm_search import InventoryQueryParser  # noqa: E402
+
+QUERIES = [
+    "show me cheap electronics under $50",
+    "low stock items",
+    "expensive category 4321 over 100",
+    "red running shoes",
+    "out of stock garden tools 17",
+]
+
+
+def make_vocabulary(size: int) -> list[str]:
+    """`size` category names, alternating one- and three-word names."""
+    return [f"category {i}" if i % 2 else f"garden tools {i}" for i in range(size)]
+
+
+def substring_scan(query: str, terms: list[str]) -> str | None:
+    """The previous category lookup: one `in` check per term."""
+    query_lower = query.lower()
+    for term in terms:
+        if term in query_lower:
+            return term
+    return None
+
+
+def timed(fn, queries: int) -> float:
+    """Microseconds per call over `queries` calls."""
+    start = time.perf_counter()
+    for i in range(queries):
+        fn(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - start) / queries * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    query_parser = InventoryQueryParser()
+    print(f"{'categories':>10} {'parser us/q':>12} {'substring us/q':>15}")
+    for size in (10, 100, 1000, 5000, 20000):
+        names = make_vocabulary(size)
+        category_vocabulary.load(names)
+        parse_us = timed(query_parser._parse_with_regex, args.queries)
+        scan_us = timed(lambda q: substring_scan(q, names), max(args.queries // 20, 100))
+        print(f"{size:>10} {parse_us:>12.1f} {scan_us:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
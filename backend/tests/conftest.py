@@ -5,11 +5,13 @@ from typing import AsyncGenerator
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 # Set test environment BEFORE importing app
 os.environ["TESTING"] = "1"
 
-from app.database import init_db
+from app.database import Base, enable_sqlite_foreign_keys, init_db
+import app.models  # noqa: F401  (register tables on Base.metadata)
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -54,6 +56,21 @@ async def auth_client(client: AsyncClient) -> AsyncGenerator[AsyncClient, None]:
     yield client
 
 
+@pytest_asyncio.fixture
+async def db_session(tmp_path) -> AsyncGenerator[AsyncSession, None]:
+    """Isolated database session backed by a throwaway SQLite file."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'isolated.db'}")
+    enable_sqlite_foreign_keys(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+    
+    await engine.dispose()
+
+
 def pytest_configure(config):
     """Configure pytest to exit cleanly."""
     os.environ["TESTING"] = "1"
@@ -0,0 +1,467 @@
+"""Cache service tests (Redis is replaced by an in-memory fake)."""
+import asyncio
+import time
+from fnmatch import fnmatchcase
+
+import pytest
+
+from app.core import codecs
+from app.core.cache import INVALIDATION_CHANNEL, CachePolicy, CacheService, LocalLRU
+from app.services import prediction
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the Redis commands CacheService uses."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.expires_at: dict[str, float] = {}
+        self.down = False
+        self.gets = 0
+        self.published: list[tuple[str, str]] = []
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("Redis unavailable")
+
+    def _expire_stale(self, key):
+        if key in self.expires_at and self.expires_at[key] <= time.monotonic():
+            self.data.pop(key, None)
+            del self.expires_at[key]
+
+    async def get(self, key):
+        self._check()
+        self._expire_stale(key)
+        self.gets += 1
+        return self.data.get(key)
+
+    async def pttl(self, key):
+        self._check()
+        self._expire_stale(key)
+        if key not in self.data:
+            return -2
+        if key not in self.expires_at:
+            return -1
+        return int((self.expires_at[key] - time.monotonic()) * 1000)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self._check()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.expires_at.pop(key, None)
+        if ex is not None:
+            self.expires_at[key] = time.monotonic() + ex
+        return True
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def eval(self, script, numkeys, key, token):
+        """Only the compare-and-delete unlock script is supported."""
+        self._check()
+        if self.data.get(key) == token:
+            del self.data[key]
+            return 1
+        return 0
+
+    async def incr(self, key):
+        self._check()
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def scan_iter(self, match, count=None):
+        self._check()
+        for key in list(self.data):
+            if fnmatchcase(key, match):
+                yield key
+
+    async def delete(self, *keys):
+        self._check()
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def publish(self, channel, message):
+        self._check()
+        self.published.append((channel, message))
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+class FakePipeline:
+    """Queues commands and runs them in order on execute()."""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def get(self, key):
+        self.commands.append((self.redis.get, key))
+        return self
+
+    def pttl(self, key):
+        self.commands.append((self.redis.pttl, key))
+        return self
+
+    async def execute(self):
+        return [await command(key) for command, key in self.commands]
+
+
+class FakePubSub:
+    """Replays messages published on the shared FakeRedis."""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.position = len(redis.published)
+
+    async def subscribe(self, channel):
+        self.redis._check()
+
+    async def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        self.redis._check()
+        if self.position < len(self.redis.published):
+            self.position += 1
+            return {"data": self.redis.published[self.position - 1][1]}
+        await asyncio.sleep(0.01)
+        return None
+
+    async def aclose(self):
+        pass
+
+
+def make_cache(**policies: CachePolicy) -> tuple[CacheService, FakeRedis]:
+    service = CacheService(policies=policies)
+    service.redis = FakeRedis()
+    service.bus_live = True
+    return service, service.redis
+
+
+class TestLocalTier:
+    """The in-process tier in front of Redis."""
+
+    def test_byte_budget_evicts_least_recently_used(self):
+        """Entries are evicted once their sizes exceed max_bytes."""
+        lru = LocalLRU(max_entries=100, ttl=60, max_bytes=10)
+        lru.set("a", 1, size=4)
+        lru.set("b", 2, size=4)
+        lru.get("a")
+        lru.set("c", 3, size=4)
+        assert lru.get("b") is None
+        assert (lru.get("a"), lru.get("c")) == (1, 3)
+        assert lru.size_bytes == 8
+
+    @pytest.mark.asyncio
+    async def test_local_copy_expires_with_redis_entry(self):
+        """A copy filled from Redis is not kept past the key's remaining TTL."""
+        policy = CachePolicy(local_ttl=60)
+        writer, redis = make_cache(product_count_=policy)
+        reader = CacheService(policies={"product_count_": policy})
+        reader.redis = redis
+        reader.bus_live = True
+
+        await writer.set("product_count_abc", 5, expire=0.05)
+        assert await reader.get("product_count_abc") == 5
+        await asyncio.sleep(0.06)
+        assert await reader.get("product_count_abc") is None
+
+    @pytest.mark.asyncio
+    async def test_hot_keys_skip_redis(self):
+        """Namespaces with a local policy are read from memory."""
+        service, redis = make_cache(dashboard_stats_=CachePolicy(local_ttl=5))
+        await service.set("dashboard_stats_admin", {"total": 3})
+        await service.set("import_job_1", {"status": "queued"})
+
+        for _ in range(3):
+            assert await service.get("dashboard_stats_admin") == {"total": 3}
+            assert await service.get("import_job_1") == {"status": "queued"}
+
+        assert redis.gets == 3  # Only the Redis-only namespace
+        stats = service.stats()["namespaces"]
+        assert stats["dashboard_stats_"]["local_hit_ratio"] == 1.0
+        assert stats["default"]["redis_hit_ratio"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_local_ttl_and_redis_fill(self):
+        """Expired local entries are refilled from Redis."""
+        service, redis = make_cache(product_count_=CachePolicy(local_ttl=0.01))
+        await service.set("product_count_x", 42)
+        await asyncio.sleep(0.02)
+
+        assert await service.get("product_count_x") == 42
+        assert await service.get("product_count_x") == 42
+        assert redis.gets == 1
+        assert service.stats()["namespaces"]["product_count_"]["redis_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_serves_during_redis_blip(self):
+        """Local entries keep being served while Redis errors."""
+        service, redis = make_cache(dashboard_stats_=CachePolicy(local_ttl=5))
+        await service.set("dashboard_stats_staff", {"total": 1})
+        redis.down = True
+
+        assert await service.get("dashboard_stats_staff") == {"total": 1}
+        assert await service.get("import_job_2") is None
+
+    @pytest.mark.asyncio
+    async def test_delete_pattern_clears_both_tiers(self):
+        """Invalidation drops matching local entries too."""
+        service, redis = make_cache(dashboard_stats_=CachePolicy(local_ttl=5))
+        await service.set("dashboard_stats_admin", {"total": 3})
+        await service.delete_pattern("dashboard_stats_*")
+
+        assert await service.get("dashboard_stats_admin") is None
+        assert redis.data == {}
+
+
+class TestInvalidationBus:
+    """Invalidations reach the local tiers of every worker."""
+
+    @pytest.mark.asyncio
+    async def test_remote_invalidation_evicts_local_entries(self):
+        """A pattern deleted by one worker is evicted from another's memory."""
+        policy = CachePolicy(local_ttl=60)
+        writer, redis = make_cache(dashboard_stats_=policy)
+        reader = CacheService(policies={"dashboard_stats_": policy})
+        reader.redis = redis
+        reader.bus_live = True
+
+        await reader.set("dashboard_stats_admin", {"total": 3})
+        await writer.delete_pattern("dashboard_stats_*")
+        channel, message = redis.published[-1]
+        assert channel == INVALIDATION_CHANNEL
+
+        writer._on_invalidation(message)  # Own message: ignored
+        reader._on_invalidation(message)
+        assert reader.local.get("dashboard_stats_admin") is None
+
+    @pytest.mark.asyncio
+    async def test_key_invalidation_is_literal(self):
+        """Single-key deletes do not act as glob patterns."""
+        service, redis = make_cache(dashboard_stats_=CachePolicy(local_ttl=60))
+        await service.set("dashboard_stats_a", 1)
+        await service.set("dashboard_stats_*", 2)
+        await service.delete("dashboard_stats_*")
+        assert service.local.get("dashboard_stats_a") == 1
+        assert service.local.get("dashboard_stats_*") is None
+
+    @pytest.mark.asyncio
+    async def test_listener_applies_messages(self):
+        """The subscribed listener evicts entries on other workers' messages."""
+        policy = CachePolicy(local_ttl=60)
+        reader, redis = make_cache(product_count_=policy)
+        reader.bus_live = False
+        writer = CacheService(policies={"product_count_": policy})
+        writer.redis = redis
+
+        reader.start_listener()
+        try:
+            for _ in range(50):
+                if reader.bus_live:
+                    break
+                await asyncio.sleep(0.01)
+            await reader.set("product_count_x", 7)
+            await writer.delete_pattern("product_count_*")
+            await asyncio.sleep(0.05)
+            assert reader.local.get("product_count_x") is None
+        finally:
+            reader.stop_listener()
+
+    @pytest.mark.asyncio
+    async def test_forecast_snapshots_follow_the_bus(self, monkeypatch):
+        """Remote forecast invalidations also clear prediction's local snapshots."""
+        service, _ = make_cache()
+        monkeypatch.setattr(service, "_invalidators", [prediction._drop_local_snapshots])
+        key = f"{prediction.FORECAST_CACHE_PREFIX}30_14"
+        monkeypatch.setitem(prediction._local_snapshots, key, (float("inf"), []))
+        generation = prediction._generation
+
+        service._on_invalidation('{"origin": "other", "pattern": "dashboard_stats_*"}')
+        assert key in prediction._local_snapshots
+
+        service._on_invalidation(f'{{"origin": "other", "pattern": "{prediction.FORECAST_CACHE_PREFIX}*"}}')
+        assert key not in prediction._local_snapshots
+        assert prediction._generation > generation
+
+    @pytest.mark.asyncio
+    async def test_fallback_ttl_without_subscription(self, monkeypatch):
+        """Local entries are short-lived while the bus is down."""
+        from app.core import cache as cache_module
+
+        monkeypatch.setattr(cache_module.settings, "local_cache_fallback_ttl", 0.01)
+        service, redis = make_cache(dashboard_stats_=CachePolicy(local_ttl=60))
+        service.bus_live = False
+        await service.set("dashboard_stats_admin", {"total": 3})
+        await asyncio.sleep(0.02)
+        assert service.local.get("dashboard_stats_admin") is None
+
+
+class TestGenerations:
+    """Generational namespaces invalidate with one INCR, never a key scan."""
+
+    @pytest.mark.asyncio
+    async def test_invalidation_is_one_incr(self, monkeypatch):
+        """delete_pattern bumps the counter and leaves old entries to expire."""
+        service, redis = make_cache(product_count_=CachePolicy(generational=True))
+
+        async def no_scan(*args, **kwargs):
+            raise AssertionError("generational invalidation must not scan")
+            yield
+
+        monkeypatch.setattr(redis, "scan_iter", no_scan)
+        await service.set("product_count_abc", 5)
+        assert set(redis.data) == {"product_count_0:abc"}
+
+        await service.delete_pattern("product_count_*")
+        assert await service.get("product_count_abc") is None
+        assert redis.data["cache_generation:product_count_"] == "1"
+        assert "product_count_0:abc" in redis.data  # Expires on its own
+
+        await service.set("product_count_abc", 6)
+        assert await service.get("product_count_abc") == 6
+
+    @pytest.mark.asyncio
+    async def test_set_skipped_after_invalidation(self):
+        """A value computed before an invalidation is not stored under the new generation."""
+        service, redis = make_cache(product_count_=CachePolicy(local_ttl=60, generational=True))
+        generation = await service.generation("product_count_")
+
+        await service.delete_pattern("product_count_*")  # Write commits mid-count
+        await service.set("product_count_abc", 5, generation=generation)
+        assert await service.get("product_count_abc") is None
+
+        await service.set("product_count_abc", 6, generation=await service.generation("product_count_"))
+        assert await service.get("product_count_abc") == 6
+
+    @pytest.mark.asyncio
+    async def test_other_workers_follow_the_generation(self):
+        """The bus message carries the new generation to other workers."""
+        policy = CachePolicy(local_ttl=60, generational=True)
+        writer, redis = make_cache(dashboard_stats_=policy)
+        reader = CacheService(policies={"dashboard_stats_": policy})
+        reader.redis = redis
+        reader.bus_live = True
+
+        await reader.set("dashboard_stats_admin", {"total": 3})
+        await writer.delete_pattern("dashboard_stats_*")
+        reader._on_invalidation(redis.published[-1][1])
+
+        redis.gets = 0
+        assert await reader.get("dashboard_stats_admin") is None
+        assert redis.gets == 1  # The entry only; the generation is known
+
+    @pytest.mark.asyncio
+    async def test_generation_reread_while_bus_is_down(self, monkeypatch):
+        """Without the bus, a worker re-reads the counter after the fallback TTL."""
+        from app.core import cache as cache_module
+
+        monkeypatch.setattr(cache_module.settings, "local_cache_fallback_ttl", 0.01)
+        policy = CachePolicy(generational=True)
+        writer, redis = make_cache(forecast_snapshot_=policy)
+        reader = CacheService(policies={"forecast_snapshot_": policy})
+        reader.redis = redis
+
+        await reader.set("forecast_snapshot_30_14", [1])
+        await writer.delete_pattern("forecast_snapshot_*")
+        await asyncio.sleep(0.02)
+        assert await reader.get("forecast_snapshot_30_14") is None
+
+    @pytest.mark.asyncio
+    async def test_sweeper_removes_past_generations(self):
+        """The optional sweeper deletes superseded entries only."""
+        service, redis = make_cache(
+            dashboard_stats_=CachePolicy(generational=True), import_job_=CachePolicy()
+        )
+        await service.set("dashboard_stats_admin", 1)
+        await service.delete_pattern("dashboard_stats_*")
+        await service.set("dashboard_stats_admin", 2)
+        await service.set("import_job_1", {"status": "queued"})
+        redis.data["dashboard_stats_staff"] = "1"  # Written before generations
+
+        assert await service.sweep_stale_generations() == 2
+        assert set(redis.data) == {
+            "cache_generation:dashboard_stats_", "dashboard_stats_1:admin", "import_job_1",
+        }
+
+    @pytest.mark.asyncio
+    async def test_plain_patterns_use_scan(self):
+        """Non-generational patterns are deleted with SCAN batches."""
+        service, redis = make_cache()
+        await service.set("misc_a", 1)
+        await service.set("misc_b", 2)
+        await service.set("other", 3)
+        await service.delete_pattern("misc_*")
+        assert set(redis.data) == {"other"}
+
+
+class TestCodecs:
+    """Per-namespace serialization, compression and codec-tagged keys."""
+
+    @pytest.mark.asyncio
+    async def test_large_values_are_compressed(self):
+        """Values over the threshold are zlib-compressed and read back intact."""
+        service, redis = make_cache(
+            forecast_snapshot_=CachePolicy(codec="json", compress_above=100)
+        )
+        snapshot = [{"sku": f"SKU-{i}", "avg_daily_sales": i / 3} for i in range(200)]
+        await service.set("forecast_snapshot_30_14", snapshot)
+        await service.set("forecast_snapshot_small", [1, 2])
+
+        big = redis.data["forecast_snapshot_30_14|json"]
+        assert big[:1] == b"z"
+        assert len(big) < len(codecs.JsonCodec().dumps(snapshot))
+        assert redis.data["forecast_snapshot_small|json"] == b"p[1,2]"
+        assert await service.get("forecast_snapshot_30_14") == snapshot
+
+    @pytest.mark.asyncio
+    async def test_keys_are_tagged_with_the_codec(self):
+        """Untagged entries from older workers are never decoded."""
+        service, redis = make_cache(
+            dashboard_stats_=CachePolicy(codec="json"),
+            forecast_snapshot_=CachePolicy(codec="msgpack"),
+        )
+        redis.data["dashboard_stats_admin"] = '{"written_by": "old worker"}'
+        assert await service.get("dashboard_stats_admin") is None
+
+        await service.set("forecast_snapshot_1", {"a": 1})
+        tag = codecs.get_codec("msgpack").name  # "json" without msgpack installed
+        assert f"forecast_snapshot_1|{tag}" in redis.data
+        assert await service.get("forecast_snapshot_1") == {"a": 1}
+
+    @pytest.mark.asyncio
+    async def test_default_namespace_keeps_plain_json(self):
+        """Counters and job records stay plain JSON under their own key."""
+        service, redis = make_cache()
+        await service.set("import_job_1", {"status": "queued"})
+        assert redis.data["import_job_1"] == '{"status": "queued"}'
+
+    def test_stdlib_fallback_is_compatible(self, monkeypatch):
+        """Without orjson the JSON codec writes the same format."""
+        value = {"name": "Widget", "price": 9.99, "tags": ["a", None]}
+        fast = codecs.encode(codecs.JsonCodec(), value, None)
+        monkeypatch.setattr(codecs, "orjson", None)
+        slow = codecs.encode(codecs.JsonCodec(), value, None)
+        assert codecs.decode(codecs.JsonCodec(), fast) == value
+        assert slow == fast
+
+
+class TestLocks:
+    """Cross-worker locks for background refreshes."""
+
+    @pytest.mark.asyncio
+    async def test_lock_is_exclusive_until_released(self):
+        """A second taker is refused; only the holder's token releases it."""
+        service, redis = make_cache()
+        token = await service.lock("refresh", ttl=30)
+        assert token is not None
+        assert await service.lock("refresh", ttl=30) is None
+
+        await service.unlock("refresh", "not-the-token")
+        assert await service.lock("refresh", ttl=30) is None
+        await service.unlock("refresh", token)
+        assert await service.lock("refresh", ttl=30) is not None
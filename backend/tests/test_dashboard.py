@@ -0,0 +1,110 @@
+"""Dashboard stats caching tests."""
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.core.cache import cache
+from app.services import catalog, dashboard_stats
+
+
+async def _finish_refreshes() -> None:
+    """Wait for background refreshes started by this test."""
+    await asyncio.gather(*(t for t in dashboard_stats._refresh_tasks.values() if not t.done()))
+
+
+async def _stats(client: AsyncClient) -> dict:
+    response = await client.get("/api/dashboard/stats")
+    assert response.status_code == 200
+    return response.json()
+
+
+class TestStaleWhileRevalidate:
+    """Stale stats are served at once and refreshed in the background."""
+
+    @pytest.mark.asyncio
+    async def test_write_serves_stale_then_fresh(self, auth_client: AsyncClient):
+        """After a product write the old stats come back once, then new ones."""
+        await _stats(auth_client)
+        await _finish_refreshes()
+        before = await _stats(auth_client)
+
+        created = await auth_client.post("/api/products", json={
+            "sku": "SWR-TEST-001",
+            "name": "Swr widget",
+            "quantity": 4,
+            "unit_price": "2.00",
+        })
+        try:
+            assert (await _stats(auth_client))["total_products"] == before["total_products"]
+            await _finish_refreshes()
+            assert (await _stats(auth_client))["total_products"] == before["total_products"] + 1
+        finally:
+            await auth_client.delete(f"/api/products/{created.json()['id']}")
+            await _finish_refreshes()
+
+    @pytest.mark.asyncio
+    async def test_soft_ttl_triggers_one_refresh(self, auth_client: AsyncClient, monkeypatch):
+        """Past the soft TTL, concurrent readers share one background refresh."""
+        await _stats(auth_client)
+        await _finish_refreshes()
+        monkeypatch.setattr(dashboard_stats.settings, "dashboard_stats_soft_ttl", -1)
+
+        refreshes = 0
+        original = dashboard_stats._refresh
+
+        async def counting_refresh(role):
+            nonlocal refreshes
+            refreshes += 1
+            await asyncio.sleep(0.05)
+            await original(role)
+
+        monkeypatch.setattr(dashboard_stats, "_refresh", counting_refresh)
+        await asyncio.gather(*(_stats(auth_client) for _ in range(5)))
+        await _finish_refreshes()
+        assert refreshes == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_skipped_while_another_worker_holds_the_lock(
+        self, auth_client: AsyncClient, monkeypatch
+    ):
+        """Only the lock holder recomputes."""
+        await _stats(auth_client)
+        await _finish_refreshes()
+        computed = 0
+
+        async def counting_compute(db, role):
+            nonlocal computed
+            computed += 1
+            return await original_compute(db, role)
+
+        async def held_elsewhere(name, ttl):
+            return None
+
+        original_compute = dashboard_stats.compute_dashboard_stats
+        monkeypatch.setattr(dashboard_stats, "compute_dashboard_stats", counting_compute)
+        monkeypatch.setattr(cache, "lock", held_elsewhere)
+        monkeypatch.setattr(dashboard_stats.settings, "dashboard_stats_soft_ttl", -1)
+
+        await _stats(auth_client)
+        await _finish_refreshes()
+        assert computed == 0
+
+    @pytest.mark.asyncio
+    async def test_version_check_is_rate_limited(self, auth_client: AsyncClient, monkeypatch):
+        """Reads re-check the shared catalog version at most once per interval."""
+        await _stats(auth_client)
+        await _finish_refreshes()
+        reads = 0
+        original = catalog.get_catalog_version
+
+        async def counting_version():
+            nonlocal reads
+            reads += 1
+            return await original()
+
+        monkeypatch.setattr(catalog, "get_catalog_version", counting_version)
+        monkeypatch.setattr(catalog, "_seen_versions", {})
+        for _ in range(5):
+            await _stats(auth_client)
+        assert reads == 1
@@ -0,0 +1,93 @@
+"""Columnar (Arrow IPC / Parquet) export tests."""
+import io
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+
+from app.services import columnar_export
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class TestColumnarExport:
+    """Product and sales exports in Arrow formats."""
+
+    @pytest.mark.asyncio
+    async def test_products_arrow_keeps_exact_prices(self, auth_client: AsyncClient):
+        """Arrow IPC export matches the list endpoint, with decimal prices."""
+        created = await auth_client.post("/api/products", json={
+            "sku": "ARROW-TEST-001",
+            "name": "Arrowwidget",
+            "quantity": 3,
+            "unit_price": "19.99",
+        })
+        product_id = created.json()["id"]
+
+        try:
+            response = await auth_client.get(
+                "/api/products/export/arrow", params={"search": "ARROW-TEST"}
+            )
+            assert response.status_code == 200
+            assert response.headers["content-type"] == columnar_export.MEDIA_TYPES["arrow"]
+
+            table = pa.ipc.open_stream(response.content).read_all()
+            assert table.schema.field("unit_price").type == pa.decimal128(10, 2)
+            assert table.column("sku").to_pylist() == ["ARROW-TEST-001"]
+            assert table.column("unit_price").to_pylist() == [Decimal("19.99")]
+        finally:
+            await auth_client.delete(f"/api/products/{product_id}")
+
+    @pytest.mark.asyncio
+    async def test_products_parquet_in_several_batches(
+        self, auth_client: AsyncClient, monkeypatch
+    ):
+        """Parquet export is written batch by batch and reads back whole."""
+        monkeypatch.setattr(columnar_export, "EXPORT_BATCH_ROWS", 3)
+        listed = (await auth_client.get("/api/products", params={"page_size": 100})).json()
+
+        response = await auth_client.get("/api/products/export/parquet")
+        assert response.status_code == 200
+
+        parquet = pq.ParquetFile(io.BytesIO(response.content))
+        assert parquet.metadata.num_rows == listed["total"]
+        assert parquet.metadata.num_row_groups > 1
+        skus = parquet.read().column("sku").to_pylist()
+        assert skus == sorted(skus)
+
+    @pytest.mark.asyncio
+    async def test_sales_export_date_range(self, auth_client: AsyncClient):
+        """Sales export honours the inclusive UTC date range."""
+        today = date.today()
+        response = await auth_client.get("/api/analytics/sales/export/parquet", params={
+            "start_date": (today - timedelta(days=7)).isoformat(),
+            "end_date": today.isoformat(),
+        })
+        assert response.status_code == 200
+
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.column_names == ["id", "product_id", "sku", "quantity_sold", "sold_at"]
+        earliest = today - timedelta(days=7)
+        assert all(ts.date() >= earliest for ts in table.column("sold_at").to_pylist())
+
+    @pytest.mark.asyncio
+    async def test_unknown_format_and_bad_range(self, auth_client: AsyncClient):
+        """Only arrow/parquet are accepted; reversed ranges are rejected."""
+        assert (await auth_client.get("/api/products/export/xlsx")).status_code == 422
+        response = await auth_client.get("/api/analytics/sales/export/arrow", params={
+            "start_date": "2024-02-01",
+            "end_date": "2024-01-01",
+        })
+        assert response.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_missing_pyarrow(self, auth_client: AsyncClient, monkeypatch):
+        """Without the optional dependency the endpoints answer 501."""
+        from app.routers import analytics, products
+
+        monkeypatch.setattr(products, "pyarrow_available", lambda: False)
+        monkeypatch.setattr(analytics, "pyarrow_available", lambda: False)
+        assert (await auth_client.get("/api/products/export/arrow")).status_code == 501
+        assert (await auth_client.get("/api/analytics/sales/export/parquet")).status_code == 501
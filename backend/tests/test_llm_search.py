@@ -0,0 +1,326 @@
+"""Smart search query parser tests (Gemini calls use a fake client)."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.cache import cache
+from app.services import llm_search
+from app.services.category_vocabulary import build_automaton, category_vocabulary, split_words
+from app.services.llm_search import InventoryQueryParser, normalize_query
+
+
+class FakeModels:
+    """Stand-in for client.aio.models with scripted latency and failures."""
+
+    def __init__(self, delay: float = 0.0, error: Exception | None = None,
+                 text: str = '{"name_contains": "phone"}'):
+        self.delay = delay
+        self.error = error
+        self.text = text
+        self.calls = 0
+
+    async def generate_content(self, model: str, contents: str):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return SimpleNamespace(text=self.text)
+
+
+def make_parser(models: FakeModels) -> InventoryQueryParser:
+    parser = InventoryQueryParser()
+    parser._initialized = True
+    parser.ai_available = True
+    parser.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return parser
+
+
+@pytest.fixture(autouse=True)
+def fast_limits(monkeypatch):
+    """Short timeout so slow calls are detected quickly."""
+    monkeypatch.setattr(llm_search.settings, "llm_timeout_seconds", 0.2)
+
+
+@pytest.fixture(autouse=True)
+def fresh_parse_cache():
+    """Parses live in the shared in-process tier; start each test without them."""
+    llm_search.query_parser.cache.clear()
+
+
+def parse_counters() -> dict:
+    """Lookup counters of the parsed-query namespace so far."""
+    namespace = cache.stats()["namespaces"].get(llm_search.PARSED_QUERY_CACHE_PREFIX, {})
+    return {outcome: namespace.get(outcome, 0) for outcome in ("local_hits", "misses")}
+
+
+class TestGeminiCalls:
+    """Timeouts, non-blocking calls and the circuit breaker."""
+
+    @pytest.mark.asyncio
+    async def test_ai_result_used(self):
+        """A healthy client is used and its JSON parsed."""
+        parser = make_parser(FakeModels())
+        result = await parser.parse("phones")
+        assert result.parse_method == "ai"
+        assert result.name_contains == "phone"
+
+    @pytest.mark.asyncio
+    async def test_slow_call_times_out_without_blocking(self):
+        """A hung LLM call is cut off at the timeout; the loop keeps running."""
+        parser = make_parser(FakeModels(delay=5.0))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            result = await parser.parse("cheap gadgets")
+        finally:
+            task.cancel()
+
+        assert loop.time() - started < 1.0
+        assert result.parse_method == "regex"
+        assert result.sort_by == "price"
+        assert ticks > 5
+
+    @pytest.mark.asyncio
+    async def test_breaker_opens_after_consecutive_failures(self):
+        """After the failure threshold, queries go straight to regex."""
+        models = FakeModels(error=RuntimeError("503 from upstream"))
+        parser = make_parser(models)
+        threshold = parser.breaker.failure_threshold
+
+        for _ in range(threshold + 3):
+            result = await parser.parse("what sells best")
+            assert result.parse_method == "regex"
+
+        assert models.calls == threshold
+        assert parser.breaker.state == "open"
+
+    @pytest.mark.asyncio
+    async def test_breaker_half_open_trial(self):
+        """After the reset period one trial call decides whether to close."""
+        models = FakeModels(error=RuntimeError("down"))
+        parser = make_parser(models)
+        parser.breaker.reset_seconds = 0.05
+        for _ in range(parser.breaker.failure_threshold):
+            await parser.parse("kids gifts")
+        assert parser.breaker.state == "open"
+
+        # Still failing: the trial re-opens the breaker
+        await asyncio.sleep(0.06)
+        await parser.parse("kids gifts")
+        assert models.calls == parser.breaker.failure_threshold + 1
+        assert parser.breaker.state == "open"
+
+        # Recovered: the next trial closes it
+        models.error = None
+        await asyncio.sleep(0.06)
+        assert (await parser.parse("kids gifts")).parse_method == "ai"
+        assert parser.breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_cancelled_trial_is_not_a_failure(self):
+        """A request cancelled mid-trial frees the slot and leaves the count alone."""
+        models = FakeModels(error=RuntimeError("down"))
+        parser = make_parser(models)
+        parser.breaker.reset_seconds = 0.05
+        for _ in range(parser.breaker.failure_threshold):
+            await parser.parse("kids gifts")
+        await asyncio.sleep(0.06)
+        failures = parser.breaker.failures
+
+        models.error, models.delay = None, 5.0
+        task = asyncio.create_task(parser.parse("kids gifts"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert parser.breaker.failures == failures
+        assert parser.breaker.state == "half_open"
+        models.delay = 0.0
+        assert (await parser.parse("kids gifts")).parse_method == "ai"
+
+    @pytest.mark.asyncio
+    async def test_slow_successes_count_as_failures(self, monkeypatch):
+        """Calls over the latency budget trip the breaker even if they succeed."""
+        monkeypatch.setattr(llm_search.settings, "llm_timeout_seconds", 1.0)
+        models = FakeModels(delay=0.05)
+        parser = make_parser(models)
+        parser.breaker.slow_call_seconds = 0.01
+
+        for i in range(parser.breaker.failure_threshold):
+            await parser.parse(f"gift ideas {i}")  # Distinct queries: no cache hits
+        assert parser.breaker.state == "open"
+        assert (await parser.parse("gift ideas")).parse_method == "regex"
+
+
+class TestParsedQueryCache:
+    """Repeat queries are answered from the parsed-query cache."""
+
+    def test_normalization_folds_case_space_and_numbers(self):
+        """Equivalent spellings share one cache key."""
+        assert normalize_query("  Phones   UNDER $1,000.00 ") == "phones under 1000"
+        assert normalize_query("phones under 1000") == "phones under 1000"
+        assert normalize_query("under 49.50") == "under 49.5"
+
+    @pytest.mark.asyncio
+    async def test_thousands_separator_parses_like_plain_number(self):
+        """Spellings that share a cache key also share the parsed price."""
+        parser = make_parser(FakeModels())
+        parser.ai_available = False
+        formatted = await parser.parse("electronics under $1,000")
+        parser.cache.clear()
+        plain = await parser.parse("electronics under 1000")
+
+        assert formatted.max_price == plain.max_price == 1000
+        assert formatted.filters() == plain.filters()
+        assert formatted.raw_query == "electronics under $1,000"
+
+    @pytest.mark.asyncio
+    async def test_repeat_queries_skip_the_llm(self):
+        """Only the first of several equivalent questions calls the LLM."""
+        models = FakeModels()
+        parser = make_parser(models)
+        before = parse_counters()
+
+        first = await parser.parse("Gifts for dad under $50")
+        again = await parser.parse("gifts for DAD  under 50.00")
+
+        assert models.calls == 1
+        assert again.parse_method == "ai"
+        assert again.name_contains == first.name_contains
+        assert again.raw_query == "gifts for DAD  under 50.00"
+        after = parse_counters()
+        assert after["local_hits"] - before["local_hits"] == 1
+        assert after["misses"] - before["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fallback_after_ai_failure_not_cached(self):
+        """A regex fallback caused by an LLM error is not cached."""
+        models = FakeModels(error=RuntimeError("down"))
+        parser = make_parser(models)
+
+        await parser.parse("cheap gizmos")
+        models.error = None
+        assert (await parser.parse("cheap gizmos")).parse_method == "ai"
+        assert models.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_local_tier_is_bounded(self, monkeypatch):
+        """Parses share the cache's in-process tier, which evicts LRU entries."""
+        parser = make_parser(FakeModels())
+        cache.local.clear()
+        monkeypatch.setattr(cache.local, "max_entries", 2)
+        for query in ("a1", "b2", "c3"):
+            await parser.parse(query)
+        assert len(cache.local) == 2
+        assert await parser.cache.get("a1") is None
+
+
+class TestConfidenceGate:
+    """The rule-based parser answers the queries it understands."""
+
+    @pytest.mark.parametrize("query", [
+        "under $50",
+        "low stock items",
+        "cheap electronics",
+        "show me expensive furniture over 100",
+    ])
+    @pytest.mark.asyncio
+    async def test_confident_queries_skip_the_llm(self, query):
+        """Fully explained queries never reach the LLM."""
+        models = FakeModels()
+        parser = make_parser(models)
+        result = await parser.parse(query)
+        assert result.parse_method == "regex"
+        assert result.confidence == 1.0
+        assert models.calls == 0
+
+    def test_confidence_counts_name_guesses_half(self):
+        """Words only guessed to be a product name lower the score."""
+        parser = InventoryQueryParser()
+        assert parser._parse_with_regex("phones under $50").confidence == pytest.approx(5 / 6)
+        assert parser._parse_with_regex("what sells best").confidence == 0.5
+        assert parser._parse_with_regex("").confidence == 0.0
+
+    @pytest.mark.asyncio
+    async def test_ambiguous_query_uses_the_llm(self):
+        """Queries the rules cannot explain go to the LLM."""
+        models = FakeModels()
+        parser = make_parser(models)
+        result = await parser.parse("what sells best in winter")
+        assert result.parse_method == "ai"
+        assert models.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_spent_budget_falls_back_to_regex(self):
+        """When allow_llm refuses, the regex parse is returned."""
+        models = FakeModels()
+        parser = make_parser(models)
+        result = await parser.parse("what sells best", allow_llm=lambda: False)
+        assert result.parse_method == "regex"
+        assert models.calls == 0
+        assert parser.breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_ai_parses_logged(self, tmp_path, monkeypatch):
+        """LLM parses are appended to the training log when configured."""
+        log = tmp_path / "parses.jsonl"
+        monkeypatch.setattr(llm_search.settings, "llm_parse_log_path", str(log))
+        parser = make_parser(FakeModels())
+        await parser.parse("What sells BEST")
+        await parser.parse("under $50")  # Confident: not logged
+
+        lines = log.read_text().splitlines()
+        assert len(lines) == 1
+        record = json.loads(lines[0])
+        assert record["query"] == "what sells best"
+        assert record["name_contains"] == "phone"
+
+
+class TestCategoryVocabulary:
+    """Category matching uses the categories table via one automaton pass."""
+
+    def test_automaton_finds_overlapping_phrases(self):
+        """Multi-word names and singular/plural variants are matched per word."""
+        automaton = build_automaton(["Home & Garden", "Garden", "Power Tools"])
+        words = split_words("home & garden, power tool and gardens")
+        assert automaton.find(words) == [
+            (0, 3, "home & garden"),
+            (2, 3, "garden"),
+            (3, 5, "power tools"),
+            (6, 7, "garden"),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_vocabulary_loaded_from_database(self, auth_client):
+        """A new category is understood by the parser after its write commits."""
+        created = await auth_client.post("/api/categories", json={"name": "Garden Tools"})
+        category_id = created.json()["id"]
+        try:
+            await category_vocabulary.build()
+            result = InventoryQueryParser()._parse_with_regex("cheap garden tool under $20")
+            assert result.category_contains == "garden tools"
+            assert result.confidence == 1.0
+        finally:
+            await auth_client.delete(f"/api/categories/{category_id}")
+            category_vocabulary.load([])
+
+    @pytest.mark.asyncio
+    async def test_category_change_moves_the_cache_key(self):
+        """Parses cached under an old category version are not reused."""
+        parser = make_parser(FakeModels())
+        version = category_vocabulary.version
+        await parser.parse("under $50")
+        assert await parser.cache.get("under $50", version) is not None
+        assert await parser.cache.get("under $50", version + 1) is None
@@ -0,0 +1,85 @@
+"""Per-endpoint ORM loading tests.
+
+Relationships default to lazy="raise", so each endpoint must opt in to the
+loads it needs. These tests count the ORM objects materialised per request
+to catch an accidental return of eager sales-history loading.
+"""
+from collections import Counter
+from contextlib import contextmanager
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from app.database import Base
+
+
+@contextmanager
+def count_loaded_objects():
+    """Count ORM instances loaded from the database, per model name."""
+    loaded: Counter = Counter()
+    
+    def _on_load(target, context):
+        loaded[type(target).__name__] += 1
+    
+    event.listen(Base, "load", _on_load, propagate=True)
+    try:
+        yield loaded
+    finally:
+        event.remove(Base, "load", _on_load)
+
+
+class TestEndpointLoading:
+    """Endpoints load only the objects they return."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("path, max_products", [
+        ("/api/products?page_size=20", 20),
+        ("/api/products?low_stock_only=true", 20),
+        ("/api/products/export/csv", None),
+        ("/api/search/products?q=a", 10),
+        ("/api/dashboard/low-stock", 10),
+        ("/api/analytics/forecast", 0),
+        ("/api/categories", 0),
+    ])
+    async def test_read_endpoints_skip_sales_history(
+        self, auth_client: AsyncClient, path: str, max_products: int | None
+    ):
+        """No read endpoint materialises SalesOrder rows."""
+        with count_loaded_objects() as loaded:
+            response = await auth_client.get(path)
+        
+        assert response.status_code == 200
+        assert loaded["SalesOrder"] == 0
+        if max_products is not None:
+            assert loaded["Product"] <= max_products
+
+    @pytest.mark.asyncio
+    async def test_product_write_cycle(self, auth_client: AsyncClient):
+        """Create, update, patch and delete work without implicit loads."""
+        created = await auth_client.post("/api/products", json={
+            "sku": "LOAD-TEST-001",
+            "name": "Loader Test",
+            "quantity": 3,
+            "unit_price": "1.50",
+        })
+        assert created.status_code == 201
+        product_id = created.json()["id"]
+        assert created.json()["category"] is None
+        
+        with count_loaded_objects() as loaded:
+            fetched = await auth_client.get(f"/api/products/{product_id}")
+            updated = await auth_client.put(
+                f"/api/products/{product_id}", json={"name": "Loader Test 2"}
+            )
+            patched = await auth_client.patch(
+                f"/api/products/{product_id}/quantity", json={"quantity": 9}
+            )
+        
+        assert fetched.status_code == 200
+        assert updated.json()["name"] == "Loader Test 2"
+        assert patched.json()["quantity"] == 9
+        assert loaded["SalesOrder"] == 0
+        
+        deleted = await auth_client.delete(f"/api/products/{product_id}")
+        assert deleted.status_code == 204
@@ -0,0 +1,164 @@
+"""Forecast engine tests and query-count benchmark."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.category import Category
+from app.models.product import Product
+from app.services import prediction
+from app.services.prediction import (
+    calculate_forecasts,
+    get_cached_forecasts,
+    invalidate_forecast_cache,
+    invalidate_forecasts_on_commit,
+)
+from app.services.sales_rollup import record_sales
+
+
+async def _seed_catalog(db: AsyncSession, product_count: int) -> None:
+    """Create `product_count` products, each with a few recent sales."""
+    category = Category(name="Bench")
+    db.add(category)
+    await db.flush()
+    
+    now = datetime.now(timezone.utc)
+    for i in range(product_count):
+        product = Product(
+            sku=f"BENCH-{i:05d}",
+            name=f"Bench Product {i}",
+            quantity=i % 50,
+            unit_price=1,
+            category_id=category.id if i % 2 else None,
+        )
+        db.add(product)
+        await db.flush()
+        await record_sales(db, [
+            (product.id, 2, now - timedelta(days=days_ago)) for days_ago in range(3)
+        ])
+
+
+async def _count_forecast_queries(db: AsyncSession) -> tuple[int, list]:
+    """Run calculate_forecasts and return (statements executed, forecasts)."""
+    statements: list[str] = []
+    
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    sync_engine = db.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", _record)
+    try:
+        forecasts = await calculate_forecasts(db)
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _record)
+    return len(statements), forecasts
+
+
+class TestForecastEngine:
+    """Set-based forecast engine tests."""
+
+    @pytest.mark.asyncio
+    async def test_forecast_values(self, db_session: AsyncSession):
+        """Velocity, stockout days, reorder and urgency match the formula."""
+        product = Product(sku="F-1", name="Fast", quantity=3, unit_price=1)
+        idle = Product(sku="F-2", name="Idle", quantity=40, unit_price=1)
+        db_session.add_all([product, idle])
+        await db_session.flush()
+        
+        now = datetime.now(timezone.utc)
+        await record_sales(db_session, [
+            (product.id, 30, now),
+            # Outside the 30-day window, must be ignored
+            (product.id, 500, now - timedelta(days=45)),
+        ])
+        
+        forecasts = await calculate_forecasts(db_session)
+        by_sku = {f.sku: f for f in forecasts}
+        
+        fast = by_sku["F-1"]
+        assert fast.avg_daily_sales == 1.0
+        assert fast.days_until_stockout == 3.0
+        assert fast.suggested_reorder == 11
+        assert fast.urgency == "critical"
+        
+        assert by_sku["F-2"].avg_daily_sales == 0
+        assert by_sku["F-2"].days_until_stockout is None
+        assert by_sku["F-2"].urgency == "ok"
+        assert forecasts[0].sku == "F-1"
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("product_count", [10, 250])
+    async def test_query_count_is_constant(self, db_session: AsyncSession, product_count: int):
+        """Forecasting issues one statement regardless of catalog size."""
+        await _seed_catalog(db_session, product_count)
+        
+        query_count, forecasts = await _count_forecast_queries(db_session)
+        
+        assert len(forecasts) == product_count
+        assert query_count == 1
+
+
+class TestForecastCache:
+    """Forecast snapshot cache tests (in-process tier, Redis not connected)."""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_is_shared_until_invalidated(self, db_session: AsyncSession):
+        """Repeat reads reuse one snapshot; invalidation forces a recompute."""
+        await invalidate_forecast_cache()
+        await _seed_catalog(db_session, 5)
+        
+        first = await get_cached_forecasts(db_session)
+        assert len(first) == 5
+        
+        db_session.add(Product(sku="NEW-1", name="New", quantity=1, unit_price=1))
+        await db_session.flush()
+        
+        # Served from the snapshot, so the new product is not visible yet
+        assert await get_cached_forecasts(db_session) is first
+        # Different parameters get their own snapshot
+        assert len(await get_cached_forecasts(db_session, lookback_days=7)) == 6
+        
+        await invalidate_forecast_cache()
+        assert len(await get_cached_forecasts(db_session)) == 6
+        await invalidate_forecast_cache()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_compute_once(self, db_session: AsyncSession, monkeypatch):
+        """Simultaneous cold reads share one computation."""
+        await invalidate_forecast_cache()
+        calls = 0
+        
+        async def slow_forecasts(db, lookback_days, target_days_stock):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return []
+        
+        monkeypatch.setattr(prediction, "calculate_forecasts", slow_forecasts)
+        
+        results = await asyncio.gather(*[get_cached_forecasts(db_session) for _ in range(3)])
+        
+        assert calls == 1
+        assert results == [[], [], []]
+        await invalidate_forecast_cache()
+
+    @pytest.mark.asyncio
+    async def test_invalidation_waits_for_commit(self, db_session: AsyncSession):
+        """Write paths drop snapshots only after their transaction commits."""
+        await invalidate_forecast_cache()
+        await _seed_catalog(db_session, 2)
+        await db_session.commit()
+        await asyncio.sleep(0)
+        snapshot = await get_cached_forecasts(db_session)
+        
+        db_session.add(Product(sku="NEW-2", name="New", quantity=1, unit_price=1))
+        invalidate_forecasts_on_commit(db_session)
+        await asyncio.sleep(0)
+        assert await get_cached_forecasts(db_session) is snapshot
+        
+        await db_session.commit()
+        await asyncio.sleep(0)
+        assert len(await get_cached_forecasts(db_session)) == 3
+        await invalidate_forecast_cache()
@@ -0,0 +1,496 @@
+"""Product listing tests."""
+import asyncio
+import csv
+import io
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import Base, _add_missing_columns, engine
+from app.routers import products
+from app.services import import_jobs, product_import
+
+
+@pytest.fixture
+async def paging_category(auth_client: AsyncClient):
+    """A category holding only the paging products, removed afterwards."""
+    response = await auth_client.post("/api/categories", json={"name": "Paging Test"})
+    assert response.status_code == 201
+    category_id = response.json()["id"]
+    
+    yield category_id
+    
+    await auth_client.delete(f"/api/categories/{category_id}")
+
+
+@pytest.fixture
+async def paging_products(auth_client: AsyncClient, paging_category: int):
+    """Create a batch of products sharing one search term, removed afterwards."""
+    ids = []
+    for i in range(7):
+        response = await auth_client.post("/api/products", json={
+            "sku": f"PAGE-TEST-{i:03d}",
+            "name": f"Pagingwidget {i}",
+            "quantity": i,
+            "unit_price": "2.00",
+            "category_id": paging_category,
+        })
+        assert response.status_code == 201
+        ids.append(response.json()["id"])
+    
+    yield ids
+    
+    for product_id in ids:
+        await auth_client.delete(f"/api/products/{product_id}")
+
+
+class TestCursorPagination:
+    """Keyset pagination for GET /api/products."""
+
+    @pytest.mark.asyncio
+    async def test_cursor_walk_matches_offset_pages(
+        self, auth_client: AsyncClient, paging_products: list[int], paging_category: int
+    ):
+        """Walking with next_cursor visits every row once, in offset order."""
+        params = {"category_id": paging_category, "page_size": 3}
+        
+        offset_ids = []
+        for page in (1, 2, 3):
+            response = await auth_client.get("/api/products", params={**params, "page": page})
+            offset_ids += [p["id"] for p in response.json()["items"]]
+        
+        cursor_ids = []
+        cursor = None
+        for _ in range(5):  # Bounded: a broken seek must not loop forever
+            query = {**params, "cursor": cursor} if cursor else params
+            data = (await auth_client.get("/api/products", params=query)).json()
+            cursor_ids += [p["id"] for p in data["items"]]
+            if cursor:
+                assert data["total"] is None  # Count skipped in cursor mode
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        
+        assert sorted(cursor_ids) == sorted(paging_products)
+        assert cursor_ids == offset_ids
+
+    @pytest.mark.asyncio
+    async def test_cursor_combines_with_filters(
+        self, auth_client: AsyncClient, paging_products: list[int], paging_category: int
+    ):
+        """Filters still apply on cursor pages."""
+        first = (await auth_client.get("/api/products", params={
+            "category_id": paging_category, "low_stock_only": True, "page_size": 2,
+        })).json()
+        second = (await auth_client.get("/api/products", params={
+            "category_id": paging_category, "low_stock_only": True, "page_size": 2,
+            "cursor": first["next_cursor"],
+        })).json()
+        
+        items = first["items"] + second["items"]
+        assert len(items) == 4
+        assert all(p["is_low_stock"] for p in items)
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_rejected(self, auth_client: AsyncClient):
+        """A malformed cursor is a client error."""
+        response = await auth_client.get("/api/products", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+
+class TestSearchRanking:
+    """Search results on GET /api/products are ordered by relevance."""
+
+    @pytest.mark.asyncio
+    async def test_best_match_first(self, auth_client: AsyncClient):
+        """The closest match leads even when a weaker one was updated later."""
+        ids = []
+        for sku, name in (
+            ("RANK-TEST-1", "Rankgizmo"),
+            ("RANK-TEST-2", "Deluxe extended rankgizmo travel edition"),
+        ):
+            response = await auth_client.post("/api/products", json={
+                "sku": sku, "name": name, "quantity": 1, "unit_price": "1.00",
+            })
+            ids.append(response.json()["id"])
+        
+        try:
+            data = (await auth_client.get("/api/products", params={"search": "rankgizmo"})).json()
+            assert [p["id"] for p in data["items"]] == ids
+            assert data["next_cursor"] is None
+            
+            response = await auth_client.get("/api/products", params={
+                "search": "rankgizmo", "cursor": "ignored",
+            })
+            assert response.status_code == 400
+        finally:
+            for product_id in ids:
+                await auth_client.delete(f"/api/products/{product_id}")
+
+
+class TestListTotals:
+    """Page and total fetched together."""
+
+    @pytest.mark.asyncio
+    async def test_total_rides_on_page_query(
+        self, auth_client: AsyncClient, paging_products: list[int]
+    ):
+        """No separate COUNT(*) is issued for a non-empty page."""
+        statements: list[str] = []
+        
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.lower())
+        
+        event.listen(engine.sync_engine, "before_cursor_execute", _record)
+        try:
+            response = await auth_client.get("/api/products", params={
+                "search": "Pagingwidget", "page_size": 3, "page": 2,
+            })
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _record)
+        
+        data = response.json()
+        assert data["total"] == 7
+        assert data["total_pages"] == 3
+        assert data["total_estimated"] is False
+        assert len(data["items"]) == 3
+        assert len([s for s in statements if "count(" in s]) == 1
+        assert any("over ()" in s for s in statements)
+
+    @pytest.mark.asyncio
+    async def test_total_past_last_page(
+        self, auth_client: AsyncClient, paging_products: list[int]
+    ):
+        """An empty page beyond the end still reports the exact total."""
+        data = (await auth_client.get("/api/products", params={
+            "search": "Pagingwidget", "page_size": 5, "page": 4,
+        })).json()
+        assert data["items"] == []
+        assert data["total"] == 7
+
+    @pytest.mark.asyncio
+    async def test_estimate_falls_back_to_exact_off_postgres(
+        self, auth_client: AsyncClient, paging_products: list[int]
+    ):
+        """estimate_total is ignored where planner statistics are unavailable."""
+        data = (await auth_client.get("/api/products", params={
+            "search": "Pagingwidget", "estimate_total": True,
+        })).json()
+        assert data["total"] == 7
+        assert data["total_estimated"] is False
+
+
+class TestCsvExport:
+    """Streaming GET /api/products/export/csv."""
+
+    @pytest.mark.asyncio
+    async def test_export_applies_list_filters(
+        self, auth_client: AsyncClient, paging_products: list[int]
+    ):
+        """Filters select the same products as the list endpoint."""
+        params = {"search": "Pagingwidget", "low_stock_only": "true"}
+        listed = (await auth_client.get("/api/products", params=params)).json()
+        
+        response = await auth_client.get("/api/products/export/csv", params=params)
+        assert response.status_code == 200
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert rows[0][0] == "SKU"
+        assert sorted(row[0] for row in rows[1:]) == sorted(p["sku"] for p in listed["items"])
+
+    @pytest.mark.asyncio
+    async def test_export_streams_in_chunks(
+        self, auth_client: AsyncClient, paging_products: list[int], monkeypatch
+    ):
+        """Rows arrive in several chunks, ordered by SKU, with nothing lost."""
+        monkeypatch.setattr(products, "EXPORT_CHUNK_SIZE", 3)
+        
+        # Call the endpoint directly: the test transport buffers whole bodies
+        response = await products.export_products_csv(
+            current_user=None, search="PAGE-TEST", category_id=None, low_stock_only=False,
+        )
+        chunks = [chunk async for chunk in response.body_iterator]
+        
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        assert [row[0] for row in rows[1:]] == [f"PAGE-TEST-{i:03d}" for i in range(7)]
+        assert rows[1][5] == "2.0"
+        assert len(chunks) == 1 + 3  # Header, then 3 + 3 + 1 rows
+
+
+class TestCsvImport:
+    """Batched POST /api/products/import/csv."""
+
+    @staticmethod
+    async def _import(auth_client: AsyncClient, text: str) -> dict:
+        response = await auth_client.post(
+            "/api/products/import/csv",
+            files={"file": ("products.csv", text.encode("utf-8"), "text/csv")},
+        )
+        assert response.status_code == 201
+        return response.json()
+
+    @pytest.mark.asyncio
+    async def test_import_creates_updates_and_reports_errors(
+        self, auth_client: AsyncClient, monkeypatch
+    ):
+        """Counts and row errors match the row-by-row importer, in few statements."""
+        monkeypatch.setattr(product_import, "IMPORT_CHUNK_SIZE", 2)
+        if engine.dialect.name != "postgresql":
+            async def _no_copy(*args, **kwargs):
+                raise AssertionError("COPY path used off PostgreSQL")
+            monkeypatch.setattr(product_import, "copy_import", _no_copy)
+        header = "SKU,Name,Description,Category ID,Quantity,Unit Price,Low Stock Threshold\n"
+        first = header + (
+            "IMP-TEST-001,Importwidget One,,,5,1.50,2\n"
+            ",No Sku,,,1,1.00,1\n"
+            "IMP-TEST-002,Importwidget Two,Desc,,abc,1.00,1\n"
+            "IMP-TEST-002,Importwidget Two,Desc,,7,2.25,3\n"
+            "IMP-TEST-003,,,,1,9.99,1\n"
+        )
+        
+        statements = []
+        
+        def _count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        event.listen(engine.sync_engine, "before_cursor_execute", _count)
+        try:
+            report = await self._import(auth_client, first)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _count)
+        
+        try:
+            assert report["created"] == 3
+            assert report["updated"] == 0
+            assert report["unchanged"] == 0
+            assert report["errors"] == [
+                "Row 3: Missing SKU",
+                "Row 4: invalid literal for int() with base 10: 'abc'",
+            ]
+            if engine.dialect.name == "postgresql":
+                # Staged with COPY, merged once
+                assert sum("ON CONFLICT" in s for s in statements) == 1
+            else:
+                # One lookup and one upsert per chunk of 2 CSV records
+                assert sum("ON CONFLICT" in s for s in statements) == 3
+            
+            second = header + (
+                "IMP-TEST-001,Importwidget Renamed,,,8,1.50,2\n"
+                "IMP-TEST-004,Importwidget Four,,,1,1.00,1\n"
+            )
+            report = await self._import(auth_client, second)
+            assert (report["created"], report["updated"]) == (1, 1)
+            
+            listed = (await auth_client.get(
+                "/api/products", params={"search": "IMP-TEST", "page_size": 10}
+            )).json()["items"]
+            by_sku = {p["sku"]: p for p in listed}
+            assert sorted(by_sku) == [f"IMP-TEST-00{i}" for i in range(1, 5)]
+            assert by_sku["IMP-TEST-001"]["name"] == "Importwidget Renamed"
+            assert by_sku["IMP-TEST-001"]["quantity"] == 8
+            assert by_sku["IMP-TEST-002"]["unit_price"] == "2.25"
+            assert by_sku["IMP-TEST-003"]["name"] == "IMP-TEST-003"
+        finally:
+            listed = (await auth_client.get(
+                "/api/products", params={"search": "IMP-TEST", "page_size": 10}
+            )).json()["items"]
+            for product in listed:
+                await auth_client.delete(f"/api/products/{product['id']}")
+
+
+class TestImportJobs:
+    """Background imports via /api/products/import/jobs."""
+
+    HEADER = "SKU,Name,Description,Category ID,Quantity,Unit Price,Low Stock Threshold\n"
+
+    @staticmethod
+    async def _wait(auth_client: AsyncClient, job_id: str) -> dict:
+        for _ in range(100):  # Bounded: a stuck job must not hang the suite
+            job = (await auth_client.get(f"/api/products/import/jobs/{job_id}")).json()
+            if job["status"] in ("completed", "failed"):
+                return job
+            await asyncio.sleep(0.05)
+        raise AssertionError(f"Import job did not finish: {job}")
+
+    @staticmethod
+    async def _cleanup(auth_client: AsyncClient) -> None:
+        listed = (await auth_client.get(
+            "/api/products", params={"search": "JOB-TEST", "page_size": 20}
+        )).json()["items"]
+        for product in listed:
+            await auth_client.delete(f"/api/products/{product['id']}")
+
+    @pytest.mark.asyncio
+    async def test_job_reports_progress_and_invalidates_once(
+        self, auth_client: AsyncClient, monkeypatch
+    ):
+        """A job commits in chunks, reports counts and invalidates caches once."""
+        monkeypatch.setattr(import_jobs, "IMPORT_CHUNK_SIZE", 2)
+        invalidations = []
+        
+        async def _record() -> None:
+            invalidations.append(1)
+        
+        monkeypatch.setattr(import_jobs, "_invalidate_catalog_caches", _record)
+        
+        text = self.HEADER + "".join(
+            f"JOB-TEST-{i:03d},Jobwidget {i},,,{i},1.00,1\n" for i in range(5)
+        ) + "JOB-TEST-BAD,Bad,,,x,1.00,1\n"
+        
+        response = await auth_client.post(
+            "/api/products/import/jobs",
+            files={"file": ("products.csv", text.encode("utf-8"), "text/csv")},
+        )
+        assert response.status_code == 202
+        
+        try:
+            job = await self._wait(auth_client, response.json()["id"])
+            assert job["status"] == "completed"
+            assert (job["created"], job["updated"], job["error_count"]) == (5, 0, 1)
+            assert job["rows_processed"] == 6
+            assert job["errors"] == ["Row 7: invalid literal for int() with base 10: 'x'"]
+            assert job["progress"] == 1.0
+            assert job["eta_seconds"] == 0.0
+            assert job["rows_per_second"] is not None
+            assert invalidations == [1]
+        finally:
+            await self._cleanup(auth_client)
+
+    @pytest.mark.asyncio
+    async def test_failed_job_keeps_committed_chunks(
+        self, auth_client: AsyncClient, monkeypatch
+    ):
+        """A failing chunk stops the job without undoing earlier chunks."""
+        monkeypatch.setattr(import_jobs, "IMPORT_CHUNK_SIZE", 2)
+        text = self.HEADER + (
+            "JOB-TEST-100,Jobwidget A,,,1,1.00,1\n"
+            "JOB-TEST-101,Jobwidget B,,,1,1.00,1\n"
+            "JOB-TEST-102,Jobwidget C,,999999,1,1.00,1\n"  # Unknown category
+        )
+        
+        response = await auth_client.post(
+            "/api/products/import/jobs",
+            files={"file": ("products.csv", text.encode("utf-8"), "text/csv")},
+        )
+        
+        try:
+            job = await self._wait(auth_client, response.json()["id"])
+            assert job["status"] == "failed"
+            assert job["message"]
+            assert job["created"] == 2
+            listed = (await auth_client.get(
+                "/api/products", params={"search": "JOB-TEST", "page_size": 20}
+            )).json()
+            assert listed["total"] == 2
+        finally:
+            await self._cleanup(auth_client)
+
+    @pytest.mark.asyncio
+    async def test_unknown_job(self, auth_client: AsyncClient):
+        """Unknown job ids are 404."""
+        response = await auth_client.get("/api/products/import/jobs/does-not-exist")
+        assert response.status_code == 404
+
+
+class TestParsePool:
+    """CSV validation in the import parse pool."""
+
+    CSV = (
+        "SKU,Name,Description,Category ID,Quantity,Unit Price,Low Stock Threshold\n"
+        "P-1,One,,,1,1.00,1\n"
+        "\n"
+        "P-2,Two,,,x,1.00,1\n"
+        "P-3,Three,,,3,abc,1\n"
+        "P-4,Four\n"
+        "P-5,Five,,,5,5.50,5\n"
+    )
+
+    @staticmethod
+    async def _parse(workers: int, monkeypatch) -> tuple[list, list[str]]:
+        monkeypatch.setattr(product_import.settings, "import_parse_workers", workers)
+        errors: list[str] = []
+        batches = [
+            batch async for batch in product_import.iter_row_batches(
+                io.StringIO(TestParsePool.CSV), errors, batch_size=2
+            )
+        ]
+        return batches, errors
+
+    @pytest.mark.asyncio
+    async def test_pool_matches_inline_parsing(self, monkeypatch):
+        """Pooled batches keep file order and attribute errors to the right rows."""
+        try:
+            pooled, pooled_errors = await self._parse(2, monkeypatch)
+        finally:
+            product_import.shutdown_parse_pool()
+        inline, inline_errors = await self._parse(0, monkeypatch)
+        
+        assert pooled == inline
+        assert pooled_errors == inline_errors
+        assert [[row_num for row_num, _ in batch] for batch in pooled] == [[2], [], [6]]
+        assert pooled[2][0][1]["unit_price"] == Decimal("5.50")
+        assert [e.split(":")[0] for e in pooled_errors] == ["Row 3", "Row 4", "Row 5"]
+
+
+class TestContentHash:
+    """Re-imports skip rows whose content hash is unchanged."""
+
+    CSV = (
+        "SKU,Name,Description,Category ID,Quantity,Unit Price,Low Stock Threshold\n"
+        "HASH-TEST-001,Hashwidget One,,,5,1.5,2\n"
+        "HASH-TEST-002,Hashwidget Two,,,7,2.25,3\n"
+    )
+
+    @pytest.mark.asyncio
+    async def test_resend_is_a_no_op(self, auth_client: AsyncClient):
+        """Identical rows are counted unchanged and keep their updated_at."""
+        first = await TestCsvImport._import(auth_client, self.CSV)
+        
+        try:
+            assert (first["created"], first["updated"], first["unchanged"]) == (2, 0, 0)
+            before = {
+                p["sku"]: p for p in (await auth_client.get(
+                    "/api/products", params={"search": "HASH-TEST"}
+                )).json()["items"]
+            }
+            
+            again = await TestCsvImport._import(auth_client, self.CSV)
+            assert (again["created"], again["updated"], again["unchanged"]) == (0, 0, 2)
+            
+            # API writes keep the hash current, so the import restores the value
+            product_id = before["HASH-TEST-001"]["id"]
+            await auth_client.patch(f"/api/products/{product_id}/quantity", json={"quantity": 99})
+            restored = await TestCsvImport._import(auth_client, self.CSV)
+            assert (restored["updated"], restored["unchanged"]) == (1, 1)
+            
+            after = {
+                p["sku"]: p for p in (await auth_client.get(
+                    "/api/products", params={"search": "HASH-TEST"}
+                )).json()["items"]
+            }
+            assert after["HASH-TEST-001"]["quantity"] == 5
+            assert after["HASH-TEST-002"]["updated_at"] == before["HASH-TEST-002"]["updated_at"]
+        finally:
+            listed = (await auth_client.get(
+                "/api/products", params={"search": "HASH-TEST"}
+            )).json()["items"]
+            for product in listed:
+                await auth_client.delete(f"/api/products/{product['id']}")
+
+    @pytest.mark.asyncio
+    async def test_column_added_to_existing_table(self, tmp_path):
+        """init_db adds content_hash to a products table created before it existed."""
+        test_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'old.db'}")
+        try:
+            async with test_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(text("ALTER TABLE products DROP COLUMN content_hash"))
+                await conn.run_sync(_add_missing_columns)
+                columns = await conn.run_sync(
+                    lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns("products")}
+                )
+            assert "content_hash" in columns
+        finally:
+            await test_engine.dispose()
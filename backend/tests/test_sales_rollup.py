@@ -0,0 +1,126 @@
+"""Daily sales rollup tests."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.product import Product
+from app.models.sales_daily import SalesDaily
+from app.models.sales_order import SalesOrder
+from app.services.sales_rollup import (
+    backfill_sales_rollup,
+    compact_sales_orders,
+    record_sale,
+    record_sales,
+)
+from app.services.seed_analytics import seed_sales_history
+
+
+async def _rollup(db: AsyncSession) -> dict:
+    """Return {(product_id, day): (units, order_count)}."""
+    result = await db.execute(select(SalesDaily))
+    return {
+        (r.product_id, r.day): (r.units, r.order_count)
+        for r in result.scalars().all()
+    }
+
+
+@pytest.fixture
+def noon_today() -> datetime:
+    now = datetime.now(timezone.utc)
+    return now.replace(hour=12, minute=0, second=0, microsecond=0)
+
+
+class TestSalesRollup:
+    """Sales rollup maintenance tests."""
+
+    @pytest.mark.asyncio
+    async def test_record_sales_accumulates_per_day(self, db_session: AsyncSession, noon_today):
+        """Recording sales adds units and order counts to the day bucket."""
+        product = Product(sku="R-1", name="Rollup", quantity=10, unit_price=1)
+        db_session.add(product)
+        await db_session.flush()
+        
+        await record_sales(db_session, [
+            (product.id, 2, noon_today),
+            (product.id, 3, noon_today - timedelta(hours=1)),
+            (product.id, 4, noon_today - timedelta(days=1)),
+        ])
+        await record_sale(db_session, product.id, 5, noon_today)
+        
+        rollup = await _rollup(db_session)
+        assert rollup[(product.id, noon_today.date())] == (10, 3)
+        assert rollup[(product.id, (noon_today - timedelta(days=1)).date())] == (4, 1)
+
+    @pytest.mark.asyncio
+    async def test_backfill_from_raw_orders(self, db_session: AsyncSession, noon_today):
+        """Backfill rebuilds the rollup from existing sales_orders rows."""
+        product = Product(sku="R-2", name="Legacy", quantity=10, unit_price=1)
+        db_session.add(product)
+        await db_session.flush()
+        
+        db_session.add_all([
+            SalesOrder(product_id=product.id, quantity_sold=1, sold_at=noon_today),
+            SalesOrder(product_id=product.id, quantity_sold=6, sold_at=noon_today),
+        ])
+        await db_session.flush()
+        assert await _rollup(db_session) == {}
+        
+        await backfill_sales_rollup(db_session)
+        # Idempotent: running twice does not double count
+        await backfill_sales_rollup(db_session)
+        
+        assert await _rollup(db_session) == {(product.id, noon_today.date()): (7, 2)}
+
+    @pytest.mark.asyncio
+    async def test_compaction_keeps_totals(self, db_session: AsyncSession, noon_today):
+        """Compaction deletes old raw rows without changing rolled-up totals."""
+        product = Product(sku="R-3", name="Old", quantity=10, unit_price=1)
+        db_session.add(product)
+        await db_session.flush()
+        
+        old_day = noon_today - timedelta(days=120)
+        await record_sales(db_session, [
+            (product.id, 3, old_day),
+            (product.id, 2, noon_today),
+        ])
+        before = await _rollup(db_session)
+        
+        deleted = await compact_sales_orders(db_session, retention_days=90)
+        
+        assert deleted == 1
+        assert await _rollup(db_session) == before
+        remaining = await db_session.execute(select(func.count(SalesOrder.id)))
+        assert remaining.scalar() == 1
+        
+        # A later backfill leaves compacted days untouched
+        await backfill_sales_rollup(db_session)
+        assert await _rollup(db_session) == before
+
+    @pytest.mark.asyncio
+    async def test_backdated_sale_into_compacted_day(self, db_session: AsyncSession, noon_today):
+        """A late sale for a compacted day adds to, not replaces, its rollup."""
+        product = Product(sku="R-5", name="Backdated", quantity=10, unit_price=1)
+        db_session.add(product)
+        await db_session.flush()
+        old_day = noon_today - timedelta(days=120)
+        await record_sales(db_session, [(product.id, 3, old_day)])
+        await compact_sales_orders(db_session, retention_days=90)
+        
+        # A late order for the same day, folded away by the next compaction
+        await record_sales(db_session, [(product.id, 2, old_day + timedelta(hours=1))])
+        await compact_sales_orders(db_session, retention_days=90)
+        
+        assert await _rollup(db_session) == {(product.id, old_day.date()): (5, 2)}
+
+    @pytest.mark.asyncio
+    async def test_seed_skips_when_only_rollup_remains(self, db_session: AsyncSession, noon_today):
+        """Seeding does not add fake history once raw rows were compacted away."""
+        product = Product(sku="R-4", name="Compacted", quantity=10, unit_price=1)
+        db_session.add(product)
+        await db_session.flush()
+        await record_sales(db_session, [(product.id, 3, noon_today - timedelta(days=120))])
+        await compact_sales_orders(db_session, retention_days=90)
+        
+        assert await seed_sales_history(db_session) == 0
@@ -0,0 +1,188 @@
+"""Product search backend tests."""
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.core.cache import cache
+from app.services.autocomplete import autocomplete_index
+from app.services.llm_search import ParsedQuery
+from app.services.product_search import get_search_backend
+from app.services.search_cache import search_result_cache
+
+
+class TestSearchBackend:
+    """Indexed substring search stays in sync with product writes."""
+
+    @pytest.mark.asyncio
+    async def test_sqlite_uses_fts5(self, client: AsyncClient):
+        """The SQLite test database gets the FTS5 trigram backend."""
+        assert get_search_backend().name == "fts5"
+
+    @pytest.mark.asyncio
+    async def test_index_follows_writes(self, auth_client: AsyncClient):
+        """Created, renamed and deleted products are reflected in all search paths."""
+        created = await auth_client.post("/api/products", json={
+            "sku": "FTS-TEST-001",
+            "name": "Zanzibar Lantern",
+            "quantity": 1,
+            "unit_price": "3.00",
+        })
+        product_id = created.json()["id"]
+        
+        try:
+            listed = (await auth_client.get("/api/products", params={"search": "zibar"})).json()
+            assert [p["id"] for p in listed["items"]] == [product_id]
+            
+            by_sku = (await auth_client.get("/api/search/products", params={"q": "fts-test"})).json()
+            assert [p["id"] for p in by_sku] == [product_id]
+            
+            await auth_client.put(f"/api/products/{product_id}", json={"name": "Quokka Lamp"})
+            assert (await auth_client.get("/api/search/products", params={"q": "zanzi"})).json() == []
+            renamed = (await auth_client.get("/api/search/products", params={"q": "quokka"})).json()
+            assert [p["id"] for p in renamed] == [product_id]
+        finally:
+            await auth_client.delete(f"/api/products/{product_id}")
+        
+        assert (await auth_client.get("/api/search/products", params={"q": "quokka"})).json() == []
+
+    @pytest.mark.asyncio
+    async def test_autocomplete_ranks_and_handles_short_terms(self, auth_client: AsyncClient):
+        """Short terms fall back to ILIKE; results are still returned."""
+        response = await auth_client.get("/api/search/products", params={"q": "us"})
+        assert response.status_code == 200
+        assert all(
+            "us" in p["name"].lower() or "us" in p["sku"].lower()
+            for p in response.json()
+        )
+
+
+@pytest_asyncio.fixture
+async def built_index():
+    """Build the autocomplete index against the test DB and drop it afterwards."""
+    await autocomplete_index.build()
+    yield autocomplete_index
+    autocomplete_index._version = None
+    autocomplete_index._active = False
+
+
+class TestAutocompleteIndex:
+    """In-process prefix index behind /api/search/products."""
+
+    @pytest.mark.asyncio
+    async def test_prefix_lookup(self, auth_client: AsyncClient, built_index):
+        """SKU and name-word prefixes are answered from the index."""
+        created = await auth_client.post("/api/products", json={
+            "sku": "ACI-TEST-001",
+            "name": "Velvet Okapi Cushion",
+            "quantity": 1,
+            "unit_price": "3.00",
+        })
+        product_id = created.json()["id"]
+        
+        try:
+            assert built_index.ready
+            by_word = await built_index.search("okap")
+            assert [p.id for p in by_word] == [product_id]
+            by_sku = (await auth_client.get("/api/search/products", params={"q": "aci-test"})).json()
+            assert [p["id"] for p in by_sku] == [product_id]
+            
+            await auth_client.put(f"/api/products/{product_id}", json={"name": "Velvet Tapir Cushion"})
+            assert await built_index.search("okap") == []
+            assert [p.id for p in await built_index.search("tapi")] == [product_id]
+        finally:
+            await auth_client.delete(f"/api/products/{product_id}")
+        
+        assert await built_index.search("aci-test") == []
+        assert built_index.ready
+
+    @pytest.mark.asyncio
+    async def test_sql_fallback_matches_index(self, auth_client: AsyncClient):
+        """While warming, SQL answers with the index's prefix semantics."""
+        created = await auth_client.post("/api/products", json={
+            "sku": "ACF-TEST-001",
+            "name": "Copper Wombat Kettle",
+            "quantity": 1,
+            "unit_price": "3.00",
+        })
+        product_id = created.json()["id"]
+        
+        async def lookup(q: str) -> list[int]:
+            response = await auth_client.get("/api/search/products", params={"q": q})
+            return [p["id"] for p in response.json()]
+        
+        try:
+            terms = ("wombat", "copper w", "acf-test", "ombat", "ettle")
+            assert not autocomplete_index.ready
+            from_sql = [await lookup(q) for q in terms]
+            await autocomplete_index.build()
+            from_index = [await lookup(q) for q in terms]
+            
+            assert from_sql == from_index == [[product_id]] * 3 + [[], []]
+        finally:
+            autocomplete_index._version = None
+            await auth_client.delete(f"/api/products/{product_id}")
+
+    @pytest.mark.asyncio
+    async def test_limit_and_dedup(self, built_index):
+        """A product matching on several tokens is returned once; limit is honoured."""
+        results = await built_index.search("", limit=5)
+        assert len(results) == 5
+        assert len({p.id for p in results}) == 5
+
+    @pytest.mark.asyncio
+    async def test_foreign_version_drops_index(self, built_index, monkeypatch):
+        """A catalog version bumped by another worker makes lookups fall back to SQL."""
+        from app.services import autocomplete
+        
+        async def foreign_version() -> int:
+            return built_index._version + 1
+        
+        monkeypatch.setattr(autocomplete, "get_catalog_version", foreign_version)
+        monkeypatch.setattr(built_index, "_last_check", 0.0)
+        assert await built_index.search("a") is None
+        assert not built_index.ready
+
+
+class TestSmartSearchCache:
+    """Smart-search results are shared by equivalent questions until a write."""
+
+    @pytest.mark.asyncio
+    async def test_equivalent_questions_share_results(self, auth_client: AsyncClient):
+        """Different wording with the same filters is a cache hit."""
+        def local_hits() -> int:
+            return cache.stats()["namespaces"].get("smart_search_", {}).get("local_hits", 0)
+
+        search_result_cache.clear()
+        first = await auth_client.post("/api/search/smart", json={"query": "cheapest zorblatt"})
+        hits = local_hits()
+        again = await auth_client.post("/api/search/smart", json={"query": "Zorblatt  CHEAPEST"})
+
+        assert first.json()["parsed_query"] == again.json()["parsed_query"]
+        assert local_hits() == hits + 1
+        assert again.json()["results"] == first.json()["results"]
+
+    @pytest.mark.asyncio
+    async def test_write_moves_to_fresh_results(self, auth_client: AsyncClient):
+        """A product write bumps the catalog version; no stale results."""
+        query = {"query": "zorblatt gizmo"}
+        assert (await auth_client.post("/api/search/smart", json=query)).json()["total"] == 0
+
+        created = await auth_client.post("/api/products", json={
+            "sku": "SMART-CACHE-001",
+            "name": "Zorblatt gizmo",
+            "quantity": 5,
+            "unit_price": "3.50",
+        })
+        try:
+            response = await auth_client.post("/api/search/smart", json=query)
+            assert [p["sku"] for p in response.json()["results"]] == ["SMART-CACHE-001"]
+        finally:
+            await auth_client.delete(f"/api/products/{created.json()['id']}")
+        assert (await auth_client.post("/api/search/smart", json=query)).json()["total"] == 0
+
+    def test_canonical_key_ignores_wording(self):
+        """Case, spacing, number type and unused sort order are folded."""
+        a = ParsedQuery(name_contains="Red  Shoes", max_price=50, sort_order="desc")
+        b = ParsedQuery(name_contains="red shoes", max_price=50.0, raw_query="x", parse_method="ai")
+        assert a.canonical_key() == b.canonical_key()
+        assert a.canonical_key() != ParsedQuery(name_contains="red shoes").canonical_key()
@@ -1,6 +1,7 @@
 import { toast } from 'sonner';
 import apiClient from './client';
 import type {
+    ImportJob,
     Product,
     ProductCreateInput,
     ProductFilters,
@@ -73,10 +74,17 @@ export const productsApi = {
     },
 
     /**
-     * Export products as CSV.
+     * Export products as CSV, limited to the given list filters.
      */
-    async exportCsv(): Promise<Blob> {
+    async exportCsv(filters: Partial<ProductFilters> = {}): Promise<Blob> {
+        const params: Record<string, unknown> = {};
+
+        if (filters.search) params.search = filters.search;
+        if (filters.category_id) params.category_id = filters.category_id;
+        if (filters.low_stock_only) params.low_stock_only = true;
+
         const response = await apiClient.get('/products/export/csv', {
+            params,
             responseType: 'blob',
         });
         return response.data;
@@ -85,14 +93,38 @@ export const productsApi = {
     /**
      * Import products from CSV.
      */
-    async importCsv(file: File): Promise<{ created: number; updated: number; errors: string[] }> {
+    async importCsv(file: File): Promise<{ created: number; updated: number; unchanged: number; errors: string[] }> {
         const formData = new FormData();
         formData.append('file', file);
 
         const response = await apiClient.post('/products/import/csv', formData, {
             headers: { 'Content-Type': 'multipart/form-data' },
         });
-        toast.success(`Import complete: ${response.data.created} created, ${response.data.updated} updated`);
+        toast.success(
+            `Import complete: ${response.data.created} created, ${response.data.updated} updated, ` +
+            `${response.data.unchanged} unchanged`
+        );
+        return response.data;
+    },
+
+    /**
+     * Start a background CSV import; poll getImportJob for progress.
+     */
+    async startImportJob(file: File): Promise<ImportJob> {
+        const formData = new FormData();
+        formData.append('file', file);
+
+        const response = await apiClient.post<ImportJob>('/products/import/jobs', formData, {
+            headers: { 'Content-Type': 'multipart/form-data' },
+        });
+        return response.data;
+    },
+
+    /**
+     * Get background import progress.
+     */
+    async getImportJob(id: string): Promise<ImportJob> {
+        const response = await apiClient.get<ImportJob>(`/products/import/jobs/${id}`);
         return response.data;
     },
 
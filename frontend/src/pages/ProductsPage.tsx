@@ -197,7 +197,7 @@ export function ProductsPage() {
 
     const handleExport = async () => {
         try {
-            const blob = await productsApi.exportCsv();
+            const blob = await productsApi.exportCsv(filters);
             const url = window.URL.createObjectURL(blob);
             const a = document.createElement('a');
             a.href = url;
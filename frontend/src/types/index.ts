@@ -50,6 +50,24 @@ export interface ProductListResponse {
     page: number;
     page_size: number;
     total_pages: number;
+    next_cursor?: string | null;
+    total_estimated?: boolean;
+}
+
+export interface ImportJob {
+    id: string;
+    filename: string;
+    status: 'queued' | 'running' | 'completed' | 'failed';
+    rows_processed: number;
+    created: number;
+    updated: number;
+    unchanged: number;
+    error_count: number;
+    errors: string[];
+    progress: number;
+    rows_per_second: number | null;
+    eta_seconds: number | null;
+    message?: string | null;
 }
 
 export interface ProductFilters {